@@ -0,0 +1,291 @@
+"""
+Micro benchmarks for the hot paths of the app. Run with the name of a benchmark, or without arguments to run all of them:
+
+    python benchmarks.py mousehook
+"""
+from ctypes import c_void_p
+import random
+import sys
+from time import perf_counter_ns
+
+
+def mousehookBenchmark(eventCount: int = 200_000):
+    """Feeds synthetic (wParam, lParam) streams through InputThread.lowLevelHandler, and reports ns/event."""
+
+    import mousehook
+
+    inputThread = mousehook.InputThread()
+    inputThread.callNextHook = lambda hookId, nCode, wParam, lParam: 0  # No hook chain outside the hook thread.
+
+    def makeLParam(x, y, mouseData=0):
+        return (c_void_p * 4)(y << 32 | x, mouseData, 0, 0)
+
+    streams = {"moves": [(512, makeLParam(random.randrange(3840), random.randrange(2160)))
+                         for _ in range(1000)],
+               "uninteresting": [(random.choice((0x020B, 0x020C, 0x020E, 0x0207, 0x0208)), makeLParam(0, 0))
+                                 for _ in range(1000)],
+               "buttons": [(random.choice((513, 514, 516, 517)), makeLParam(10, 10)) for _ in range(1000)],
+               "wheel": [(522, makeLParam(10, 10, random.choice((7864320, 4287102976)))) for _ in range(1000)]}
+    streams["mixed"] = random.sample(streams["moves"] * 19 + streams["buttons"], 20000)
+
+    for gate in (False, True):
+        inputThread.setMouseEnabled(gate)
+
+        for name, stream in streams.items():
+            handler = inputThread.lowLevelHandler
+            repeats = max(1, eventCount // len(stream))
+
+            start = perf_counter_ns()
+            for _ in range(repeats):
+                for wParam, lParam in stream:
+                    handler(0, wParam, lParam)
+            elapsed = perf_counter_ns() - start
+
+            inputThread.events.clear()
+            print(f"mousehook  gate {'open  ' if gate else 'closed'}  {name:<14}"
+                  f"{elapsed / (repeats * len(stream)):8.0f} ns/event")
+
+
+def getApplication():
+    from PySide2 import QtWidgets
+
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+
+def makePieMenu(sliceCount: int = 12, subsliceCount: int = 0, theme: str = "dhalu_theme") -> dict:
+    from settingsMenu import freeze
+
+    icons = ("clock.svg", "monitor.svg", "folder.svg", "copy.svg", "volume.svg", "")
+    slices = [{"label": f"Slice {i}",
+               "function": "none",
+               "params": [],
+               "icon": icons[i % len(icons)],
+               "subslices": [{"label": f"Sub slice {i}.{j}", "function": "none", "params": []}
+                             for j in range(subsliceCount)]}
+              for i in range(sliceCount)]
+
+    return freeze({"label": "Benchmark", "hotkey": "F13", "theme": theme, "slices": slices})
+
+
+def menuPoolBenchmark(sliceCount: int = 12, repeats: int = 50):
+    """Opens and closes the same pie menu, and reports the time to open it the first time and after that."""
+
+    from PySide2 import QtCore, QtGui
+    from frontend import Window
+    from settingsMenu import SettingsManager
+
+    app = getApplication()
+    globalSettings = SettingsManager.loadJSONFile("settings/globalSettings.json")["globalSettings"]
+
+    window = Window()
+    openPieMenu = makePieMenu(sliceCount, subsliceCount=6)
+
+    for _ in range(repeats):
+        window.showMenu(openPieMenu, QtGui.QCursor.pos(), globalSettings)
+        app.processEvents()
+        window.killMenu()
+        app.processEvents(QtCore.QEventLoop.AllEvents, 100)
+
+    latencies = window.openLatencies()
+    print(f"menu pool  {sliceCount} slices  first open {latencies['first']:7.2f} ms  "
+          f"re-open (median) {latencies['reopen']:7.2f} ms")
+
+    for themeName, percentiles in window.paintTimePercentiles().items():
+        print(f"paint      {themeName:<14}" + "  ".join(f"{name} {value:6.3f} ms" for name, value in percentiles.items()))
+
+
+def hoverBenchmark(repeats: int = 500, theme: str = "dhalu_theme"):
+    """
+    Moves the hover back and forth between two buttons, repainting after every change. Once the way it used to be done
+    (style sheet property + unpolish/polish), and once with the compiled button styles. Reports us/change.
+    """
+
+    from PySide2 import QtWidgets
+    from frontend import Button
+    from settings.pie_themes import pie_themes
+    from settingsMenu import SettingsManager
+
+    app = getApplication()
+    globalSettings = SettingsManager.loadJSONFile("settings/globalSettings.json")["globalSettings"]
+    openPieMenu = makePieMenu(2, theme=theme)
+
+    parent = QtWidgets.QWidget()
+    parent.resize(400, 200)
+    parent.show()
+
+    def polishHover(button, state):
+        button.setProperty("hover", state)
+        button.style().unpolish(button)
+        button.style().polish(button)
+
+    polished = [QtWidgets.QPushButton(pieSlice["label"], parent) for pieSlice in openPieMenu["slices"]]
+    for button in polished:
+        button.setStyleSheet(pie_themes[theme])
+
+    compiled = [Button(openPieMenu, pieSlice, globalSettings, parent) for pieSlice in openPieMenu["slices"]]
+
+    for name, setHover, buttons in (("polish", polishHover, polished), ("compiled", Button.setHover, compiled)):
+        for index, button in enumerate(buttons):
+            button.move(20, 20 + index * 60)
+            button.show()
+        app.processEvents()
+
+        start = perf_counter_ns()
+        for i in range(repeats):
+            setHover(buttons[i % 2], True)
+            setHover(buttons[(i + 1) % 2], False)
+            app.processEvents()
+        elapsed = perf_counter_ns() - start
+
+        for button in buttons:
+            button.hide()
+
+        print(f"hover      {name:<10}{elapsed / repeats / 1000:8.1f} us/change")
+
+    parent.close()
+
+
+def cursorTraces(center, traceCount: int = 20, length: int = 300, seed: int = 1) -> list[list[tuple[int, int]]]:
+    """Random cursor walks starting at center, seeded so every run replays the same traces."""
+
+    generator = random.Random(seed)
+
+    traces = []
+    for _ in range(traceCount):
+        x, y = center.x(), center.y()
+        trace = []
+        for _ in range(length):
+            x += generator.randint(-12, 12)
+            y += generator.randint(-12, 12)
+            trace.append((x, y))
+        traces.append(trace)
+
+    return traces
+
+
+def sectorBenchmark(sliceCounts=(4, 8, 16, 32, 64)):
+    """
+    Replays cursor traces over menus with more and more slices. Every step the selection found through the sector
+    table is checked against the exhaustive search, and the time per lookup of both is reported.
+    """
+
+    from PySide2 import QtCore, QtGui
+    from frontend import Window
+    from settingsMenu import SettingsManager
+
+    app = getApplication()
+    globalSettings = SettingsManager.loadJSONFile("settings/globalSettings.json")["globalSettings"]
+    window = Window()
+
+    for sliceCount in sliceCounts:
+        window.showMenu(makePieMenu(sliceCount, subsliceCount=3), QtGui.QCursor.pos(), globalSettings)
+        app.processEvents()
+
+        menu = window.menu
+        presenter = menu.menuPresenter
+        timings = {"sectors": 0, "exhaustive": 0}
+        lookups = mismatches = 0
+
+        for trace in cursorTraces(menu.summonPos):
+            for x, y in trace:
+                menu.currentMousePos = QtCore.QPoint(x, y)
+
+                start = perf_counter_ns()
+                selected = presenter.findSelectedButton()
+                timings["sectors"] += perf_counter_ns() - start
+
+                start = perf_counter_ns()
+                expected = presenter.findSelectedButtonExhaustive()
+                timings["exhaustive"] += perf_counter_ns() - start
+
+                lookups += 1
+                mismatches += selected is not expected
+
+                presenter.updateSelectedButton(expected)
+
+        print(f"sectors    {sliceCount:3} slices  sector table {timings['sectors'] / lookups / 1000:7.1f} us  "
+              f"exhaustive {timings['exhaustive'] / lookups / 1000:7.1f} us  mismatches {mismatches}/{lookups}")
+
+        window.killMenu()
+        app.processEvents(QtCore.QEventLoop.AllEvents, 100)
+
+
+def filterBenchmark(optionCount: int = 5000, query: str = "report"):
+    """Times typing a query into a scripted menu of optionCount options, one character at a time."""
+
+    from optionindex import OptionIndex
+
+    generator = random.Random(1)
+    words = ["report", "project", "photo", "invoice", "draft", "final", "notes", "budget", "scan", "backup"]
+    labels = [f"{generator.choice(words)} {generator.choice(words)} {number}" for number in range(optionCount)]
+
+    start = perf_counter_ns()
+    index = OptionIndex(labels)
+    buildTime = perf_counter_ns() - start
+
+    print(f"filter     {optionCount} options  index built in {buildTime / 1_000_000:.1f} ms")
+
+    for length in range(1, len(query) + 1):
+        start = perf_counter_ns()
+        matches = index.search(query[:length])
+        print(f"filter     {query[:length]!r:10} {len(matches):5} matches  {(perf_counter_ns() - start) / 1000:7.1f} us")
+
+
+def runScriptBenchmark(filePath: str = None, args: tuple = ("F99",), repeats: int = 20):
+    """
+    Times running a script with a new interpreter per run, like runScript did, against running it in a warm worker of
+    the scriptRunner. Takes a script path (e.g. one of settings/Hotkey scripts), or runs one that imports json.
+    """
+
+    import os
+    import subprocess
+    import tempfile
+    from scriptworkers import scriptRunner
+
+    script = None
+    if filePath is None:
+        script = tempfile.NamedTemporaryFile("w", suffix=".py", delete=False)
+        script.write("import json\nimport sys\n\njson.dumps(sys.argv)\n")
+        script.close()
+        filePath = script.name
+
+    timings = {"cold": [], "warm": []}
+
+    for _ in range(repeats):
+        start = perf_counter_ns()
+        subprocess.run([sys.executable, filePath, *args], check=False)
+        timings["cold"].append(perf_counter_ns() - start)
+
+    scriptRunner.start()
+    scriptRunner.run(("script", filePath, list(args)))  # The first run imports the script's modules.
+
+    for _ in range(repeats):
+        start = perf_counter_ns()
+        result = scriptRunner.run(("script", filePath, list(args)))
+        timings["warm"].append(perf_counter_ns() - start)
+
+    if result[0] == "error":
+        print(f"runscript  {filePath} failed in the worker:", result[1])
+
+    scriptRunner.shutdown()
+
+    if script:
+        os.remove(filePath)
+
+    for kind, runTimes in timings.items():
+        runTimes.sort()
+        print(f"runscript  {kind}  median {runTimes[len(runTimes) // 2] / 1_000_000:7.2f} ms  "
+              f"max {runTimes[-1] / 1_000_000:7.2f} ms")
+
+
+BENCHMARKS = {"mousehook": mousehookBenchmark,
+              "menupool": menuPoolBenchmark,
+              "hover": hoverBenchmark,
+              "sectors": sectorBenchmark,
+              "filter": filterBenchmark,
+              "runscript": runScriptBenchmark}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,208 @@
+# Precompiled button styles.
+# The pie themes are written as Qt style sheets (see settings/pie_themes.py). Applied as is, every hover or press change
+# needs the style sheet cascade to be re-run for the button (unpolish/polish). Instead, each theme is parsed once into
+# a ButtonStyle holding the resolved colours, font, padding and radius of every state, and Button paints itself from
+# that, so changing state is only a repaint.
+from functools import lru_cache
+import re
+
+from settings.pie_themes import pie_themes
+
+from PySide2 import QtGui, QtCore
+
+
+NORMAL, HOVER, PRESSED = "normal", "hover", "pressed"
+SELECTOR_STATES = {"QPushButton": NORMAL,
+                   "QPushButton[hover=true]": HOVER,
+                   "QPushButton:pressed": PRESSED,
+                   "QPushButton[pressed=true]": PRESSED}
+
+# CSS font weights to QFont weights.
+FONT_WEIGHTS = {100: QtGui.QFont.Thin, 200: QtGui.QFont.ExtraLight, 300: QtGui.QFont.Light, 400: QtGui.QFont.Normal,
+                500: QtGui.QFont.Medium, 600: QtGui.QFont.DemiBold, 700: QtGui.QFont.Bold, 800: QtGui.QFont.ExtraBold,
+                900: QtGui.QFont.Black}
+
+ICON_SPACING = 4  # Between the icon and the text, same as QPushButton.
+
+
+def parseStyleSheet(styleSheet: str) -> dict[str, list[tuple[str, str]]]:
+    """Returns the (property, value) declarations of each button state, in the order they're written in."""
+
+    styleSheet = re.sub(r"/\*.*?\*/", "", styleSheet, flags=re.S)
+
+    declarations = {NORMAL: [], HOVER: [], PRESSED: []}
+    for selectors, body in re.findall(r"([^{}]+)\{([^{}]*)\}", styleSheet):
+        states = {SELECTOR_STATES[selector.strip()] for selector in selectors.split(",")
+                  if selector.strip() in SELECTOR_STATES}
+
+        for declaration in body.split(";"):
+            if ":" not in declaration:
+                continue
+
+            name, value = declaration.split(":", 1)
+            for state in states:
+                declarations[state].append((name.strip().lower(), value.strip()))
+
+    return declarations
+
+
+def parseColor(value: str) -> QtGui.QColor:
+    match = re.fullmatch(r"rgba?\(([^)]*)\)", value.replace(" ", ""))
+    if match:
+        return QtGui.QColor(*[int(float(part)) for part in match.group(1).split(",")])
+
+    return QtGui.QColor(value)
+
+
+def parseLength(value: str) -> int:
+    match = re.match(r"-?\d+", value.strip())
+    return int(match.group()) if match else 0
+
+
+class StateStyle:
+    """The resolved look of a button in one state."""
+
+    def __init__(self):
+        self.textColor = QtGui.QColor(QtCore.Qt.black)
+        self.backgroundColor: QtGui.QColor | None = None
+        self.backgroundImage: QtGui.QPixmap | None = None
+        self.borderWidth = 0
+        self.borderColor = QtGui.QColor(QtCore.Qt.transparent)
+
+    def copy(self) -> "StateStyle":
+        style = StateStyle()
+        style.__dict__.update(self.__dict__)
+        return style
+
+
+class ButtonStyle:
+    def __init__(self, styleSheet: str):
+        self.font = QtGui.QFont()
+        self.padding = [0, 0, 0, 0]  # Top, right, bottom, left.
+        self.radius = 0
+        self.minSize = QtCore.QSize(0, 0)
+
+        self.states: dict[str, StateStyle] = {}
+
+        declarations = parseStyleSheet(styleSheet)
+
+        normal = StateStyle()
+        for name, value in declarations[NORMAL]:
+            self.applyBoxProperty(name, value)
+            self.applyStateProperty(normal, name, value)
+
+        # Like the style sheet, hover is applied over normal, and pressed over both.
+        hover = normal.copy()
+        for name, value in declarations[HOVER]:
+            self.applyStateProperty(hover, name, value)
+
+        pressed, hoverPressed = normal.copy(), hover.copy()
+        for name, value in declarations[PRESSED]:
+            self.applyStateProperty(pressed, name, value)
+            self.applyStateProperty(hoverPressed, name, value)
+
+        self.states = {(False, False): normal, (True, False): hover, (False, True): pressed, (True, True): hoverPressed}
+
+    def applyBoxProperty(self, name: str, value: str):
+        if name == "font-size":
+            self.font.setPixelSize(parseLength(value))
+        elif name == "font":
+            self.font.setFamily(value.strip("\"'"))
+        elif name == "font-weight":
+            self.font.setWeight(FONT_WEIGHTS.get(parseLength(value), QtGui.QFont.Normal))
+        elif name == "padding":
+            values = [parseLength(part) for part in value.split()] or [0]
+            # CSS shorthand: 1 to 4 values, top right bottom left, the missing ones mirroring the opposite side.
+            top = values[0]
+            right = values[1] if len(values) > 1 else top
+            bottom = values[2] if len(values) > 2 else top
+            left = values[3] if len(values) > 3 else right
+            self.padding = [top, right, bottom, left]
+        elif name.startswith("padding-"):
+            side = ("top", "right", "bottom", "left").index(name[8:])
+            self.padding[side] = parseLength(value)
+        elif name == "border-radius":
+            self.radius = parseLength(value)
+        elif name == "min-width":
+            self.minSize.setWidth(parseLength(value))
+        elif name == "min-height":
+            self.minSize.setHeight(parseLength(value))
+
+    @staticmethod
+    def applyStateProperty(state: StateStyle, name: str, value: str):
+        if name == "color":
+            state.textColor = parseColor(value)
+        elif name == "background-color":
+            state.backgroundColor = parseColor(value)
+        elif name == "background" and value == "none":
+            state.backgroundColor = state.backgroundImage = None
+        elif name == "background-image":
+            match = re.search(r"url\(\s*[\"']?(.*?)[\"']?\s*\)", value)
+            state.backgroundImage = QtGui.QPixmap(match.group(1).replace("\\/", "/")) if match else None
+        elif name == "border":
+            parts = value.split()
+            state.borderWidth = parseLength(parts[0]) if parts else 0
+            state.borderColor = parseColor(" ".join(parts[2:])) if len(parts) > 2 else state.textColor
+
+    def state(self, hovered: bool, pressed: bool) -> StateStyle:
+        return self.states[(hovered, pressed)]
+
+    def sizeHint(self, fontMetrics: QtGui.QFontMetrics, text: str, iconSize: QtCore.QSize | None) -> QtCore.QSize:
+        """The size QPushButton would have with the style sheet: contents, then padding and border around it."""
+
+        width, height = fontMetrics.horizontalAdvance(text), fontMetrics.height()
+        if iconSize:
+            width += iconSize.width() + (ICON_SPACING if text else 0)
+            height = max(height, iconSize.height())
+
+        width, height = max(width, self.minSize.width()), max(height, self.minSize.height())
+        border = self.states[(False, False)].borderWidth
+
+        return QtCore.QSize(width + self.padding[1] + self.padding[3] + border * 2,
+                            height + self.padding[0] + self.padding[2] + border * 2)
+
+    def paint(self, painter: QtGui.QPainter, rect: QtCore.QRect, state: StateStyle, text: str,
+              icon: QtGui.QPixmap | None):
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, on=True)
+
+        # Background and border.
+        border = state.borderWidth
+        frame = QtCore.QRectF(rect).adjusted(border / 2, border / 2, -border / 2, -border / 2)
+        painter.setPen(QtGui.QPen(state.borderColor, border) if border else QtCore.Qt.NoPen)
+
+        for brush in (state.backgroundColor, state.backgroundImage):
+            if brush is None:
+                continue
+
+            painter.setBrush(QtGui.QBrush(brush))  # A pixmap brush repeats the image, like background-image.
+            painter.drawRoundedRect(frame, self.radius, self.radius)
+
+        if border and state.backgroundColor is None and state.backgroundImage is None:
+            painter.setBrush(QtCore.Qt.NoBrush)
+            painter.drawRoundedRect(frame, self.radius, self.radius)
+
+        # Icon and text, centred together.
+        contents = rect.adjusted(self.padding[3] + border, self.padding[0] + border,
+                                 -self.padding[1] - border, -self.padding[2] - border)
+        painter.setFont(self.font)
+
+        textWidth = painter.fontMetrics().horizontalAdvance(text)
+        iconWidth = icon.width() / icon.devicePixelRatio() if icon else 0
+        spacing = ICON_SPACING if icon and text else 0
+        x = contents.x() + (contents.width() - iconWidth - spacing - textWidth) / 2
+
+        if icon:
+            iconHeight = icon.height() / icon.devicePixelRatio()
+            painter.drawPixmap(QtCore.QPointF(x, contents.y() + (contents.height() - iconHeight) / 2), icon)
+            x += iconWidth + spacing
+
+        painter.setPen(state.textColor)
+        painter.drawText(QtCore.QRectF(x, contents.y(), textWidth + 1, contents.height()),
+                         QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter, text)
+
+
+@lru_cache(maxsize=None)
+def buttonStyle(themeName: str | None) -> ButtonStyle:
+    """The compiled style of a pie theme, falling back to the dhalu theme like the style sheets did."""
+
+    return ButtonStyle(pie_themes.get(themeName, pie_themes.dhalu_theme))
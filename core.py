@@ -1,12 +1,16 @@
+from keystate import KeyStateTracker
 import mousehook
 import pieFunctions
+from scheduler import scheduler
 
-from ctypes import windll
-from functools import partial
+from collections import deque, OrderedDict
+from functools import lru_cache, partial
 import keyboard
-from re import match as re_match
+import re
+from statistics import median
 import sys
-from threading import Thread
+from time import perf_counter
+from types import MappingProxyType
 import win32gui as w32gui
 
 from PySide2 import QtGui, QtCore
@@ -26,7 +30,7 @@ def UpdateGlobalVariables(settingsManager):
         WINCHANGE_latency = settingsManager.globalSettings['winChangeLatency']
 
 
-def suspendApp(window, activeProfile, timerWinChange):
+def suspendApp(window, activeProfile, windowWatcher):
     global APP_SUSPENDED
 
     if window.menu:
@@ -35,26 +39,151 @@ def suspendApp(window, activeProfile, timerWinChange):
 
     activeProfile.hotkeyManager.flushHotkeys()
     keyboard.unhook_all()
+    hotkeyHooks.forget()
 
     # stop all timers and threads in app
-    timerWinChange.stop()
-    activeProfile.hotkeyManager.timerCheckHotkey.stop()
+    windowWatcher.stop()
 
     APP_SUSPENDED = True
 
 
-def resumeApp(activeProfile, timerWinChange):
+def resumeApp(activeProfile, windowWatcher):
     global APP_SUSPENDED
 
     # resume all timers and threads in app
-    timerWinChange.start(WINCHANGE_latency)
+    windowWatcher.pollInterval = WINCHANGE_latency
+    windowWatcher.start()
+    activeProfile.profileCache.setEnabled(not windowWatcher.usingFallback)
+    activeProfile.keyStates.install()  # Removed by keyboard.unhook_all in suspendApp.
     activeProfile.loadProfile(globalProfile=True)
-    activeProfile.hotkeyManager.timerCheckHotkey.start(25)
 
     APP_SUSPENDED = False
     # do not call construction of active_profile or instantiate it again, let's keep it clean.
 
 
+class WindowProfileCache:
+    """
+    LRU cache from window handle to its window class and effective profile, so switching between windows that were
+    seen before doesn't need GetClassName or a profile lookup. Entries are dropped when their window is destroyed,
+    and everything is dropped when the settings are reloaded. Without the destroyed windows a reused handle would
+    keep the profile of the window that had it before, so nothing is cached while they aren't reported, see setEnabled.
+    """
+
+    def __init__(self, settingsManager, maxSize: int = 128):
+        self.settingsManager = settingsManager
+        self.maxSize = maxSize
+
+        self.entries: OrderedDict[int, tuple[str | None, MappingProxyType]] = OrderedDict()
+        self.generation = settingsManager.generation
+        self.enabled = True
+
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, handle: int) -> tuple[str | None, MappingProxyType]:
+        """Returns the window class if it has a profile of its own (otherwise None), and the profile to load."""
+
+        if self.generation != self.settingsManager.generation:
+            self.entries.clear()
+            self.generation = self.settingsManager.generation
+
+        entry = self.entries.get(handle)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(handle)
+            return entry
+
+        self.misses += 1
+
+        className = w32gui.GetClassName(handle)
+        profiles = self.settingsManager.effectiveProfiles
+
+        if className != "Default" and className in profiles:
+            entry = (className, profiles[className])
+        else:
+            entry = (None, profiles["Default"])
+
+        if not self.enabled:
+            return entry
+
+        self.entries[handle] = entry
+        if len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+        return entry
+
+    def invalidate(self, handle: int):
+        self.entries.pop(handle, None)
+
+    def setEnabled(self, enabled: bool):
+        """Only enabled while destroyed windows are reported, which the ForegroundWatcher doesn't do when polling."""
+
+        self.enabled = enabled
+        if not enabled:
+            self.entries.clear()
+
+
+@lru_cache(maxsize=256)
+def compileWildcard(wildcard: str) -> re.Pattern:
+    return re.compile(wildcard)
+
+
+class WindowTitleIndex:
+    """
+    The titles of all top-level windows, collected in a single EnumWindows pass. Lookups within ttl seconds of that
+    pass are answered from the index instead of enumerating all windows again, which is what bursts of
+    findWindowWildcard calls from action scripts used to do. A foreground change invalidates it right away, so a
+    window that was just opened and focussed doesn't wait for the ttl.
+    """
+
+    def __init__(self, ttl: float = 0.5):
+        self.ttl = ttl
+
+        self.windows: list[tuple[int, str]] = []  # (handle, title), in z-order as given by EnumWindows.
+        self.titles: dict[str, list[int]] = {}
+        self.builtAt = None
+
+        self._matches: dict[str, list[int]] = {}  # wildcard -> handles, for the current index.
+
+    def refresh(self):
+        windows = []
+        w32gui.EnumWindows(lambda hwnd, _: windows.append((hwnd, str(w32gui.GetWindowText(hwnd)))), None)
+
+        self.windows = windows
+        self.titles = {}
+        for hwnd, title in windows:
+            self.titles.setdefault(title, []).append(hwnd)
+
+        self._matches.clear()
+        self.builtAt = perf_counter()
+
+    def invalidate(self, handle: int = None):
+        """Drops the index. Connected to ForegroundWatcher.foregroundChanged, which passes the new foreground handle."""
+
+        self.builtAt = None
+
+    def findAll(self, wildcard: str) -> list[int]:
+        """Handles of all windows whose title matches the wildcard regex, topmost first."""
+
+        if self.builtAt is None or perf_counter() - self.builtAt > self.ttl:
+            self.refresh()
+
+        if wildcard not in self._matches:
+            pattern = compileWildcard(wildcard)
+            matchingTitles = {title for title in self.titles if pattern.match(title)}  # Each title is matched once.
+
+            self._matches[wildcard] = [hwnd for hwnd, title in self.windows if title in matchingTitles]
+
+        return list(self._matches[wildcard])
+
+    def findFirst(self, wildcard: str) -> int | None:
+        matches = self.findAll(wildcard)
+        return matches[0] if matches else None
+
+
+windowTitleIndex = WindowTitleIndex()
+
+
 class WindowMgr:
     """Encapsulates some calls to the winapi for window management"""
 
@@ -64,29 +193,153 @@ class WindowMgr:
     def findWindow(self, classname, windowname=None):
         self._handle = w32gui.FindWindow(classname, windowname)
 
-    def _windowEnumCallback(self, hwnd, wildcard):
-        """Pass to w32gui.EnumWindows() to check all the opened windows"""
-        if re_match(wildcard, str(w32gui.GetWindowText(hwnd))) is not None:
-            self._handle = hwnd
-
     def findWindowWildcard(self, wildcard):
-        self._handle = None
-        w32gui.EnumWindows(self._windowEnumCallback, wildcard)
+        """Selects the topmost window whose title matches the wildcard regex."""
+        self._handle = windowTitleIndex.findFirst(wildcard)
+
+    def findWindowsWildcard(self, wildcard) -> list[int]:
+        return windowTitleIndex.findAll(wildcard)
 
     def setForeground(self):
         w32gui.SetForegroundWindow(self._handle)
 
 
+class HotkeyHooks:
+    """
+    The hotkeys registered with the keyboard library, counted per hotkey string. The library keeps one entry per string
+    (and per callback), so registering a string twice, like a trigger key that is also the profile hotkey, makes
+    removing either registration break the other's. Here each string is registered once, with the first user, runs the
+    callbacks of all its users, and is removed once the last of them is.
+    """
+
+    def __init__(self):
+        self.hooks: dict[str, tuple] = {}  # hotkey -> (handle returned by keyboard.add_hotkey, ((callback, args), ...))
+
+    def add(self, hotkey: str, callback, args=()) -> tuple:
+        """Returns the handle to remove this user by."""
+
+        user = (callback, tuple(args))
+        handle, users = self.hooks.get(hotkey, (None, ()))
+
+        if handle is None:
+            # A callback of its own, as the library also keys its entries by callback.
+            handle = keyboard.add_hotkey(hotkey, partial(self._fire, hotkey), suppress=True)
+
+        self.hooks[hotkey] = (handle, users + (user,))  # Replaced, not changed, as the keyboard thread reads it.
+        return hotkey, user
+
+    def remove(self, handle: tuple):
+        hotkey, user = handle
+        if hotkey not in self.hooks:
+            return
+
+        keyboardHandle, users = self.hooks[hotkey]
+        users = list(users)
+        users.remove(user)
+
+        if users:
+            self.hooks[hotkey] = (keyboardHandle, tuple(users))
+            return
+
+        del self.hooks[hotkey]
+        keyboard.remove_hotkey(keyboardHandle)
+
+    def forget(self):
+        """After keyboard.unhook_all, which removed the hotkeys already."""
+        self.hooks.clear()
+
+    def _fire(self, hotkey: str):
+        """Runs on the keyboard thread."""
+
+        for callback, args in self.hooks.get(hotkey, (None, ()))[1]:
+            callback(*args)
+
+
+hotkeyHooks = HotkeyHooks()
+
+
+class EventDispatcher(QtCore.QObject):
+    """
+    Hands calls made on other threads, like the keyboard library's hook thread, over to the GUI thread. Posting goes
+    through a queued signal, which wakes up the Qt event loop right away instead of waiting for a timer to notice.
+    """
+
+    _posted = QtCore.Signal(object, object)
+
+    def __init__(self):
+        super().__init__()
+        self._posted.connect(self._deliver, QtCore.Qt.QueuedConnection)
+
+    def post(self, func, *args):
+        """Thread-safe. Runs func(*args) on the GUI thread."""
+        self._posted.emit(func, args)
+
+    @QtCore.Slot(object, object)
+    def _deliver(self, func, args):
+        func(*args)
+
+
+class HotkeyRegistry:
+    """
+    Keeps the hotkeys registered with the keyboard library in sync with a set of bindings. Only the bindings that
+    differ from the currently registered ones are removed or added, so switching between profiles that share their
+    hotkeys (like two unregistered windows both using the default profile) doesn't touch the hook at all.
+    """
+
+    def __init__(self):
+        self.bindings: dict[str, tuple] = {}  # hotkey -> (callback args, handle returned by hotkeyHooks.add)
+
+        # Bindings touched by the last sync, and in total since startup.
+        self.lastSync = {"added": 0, "removed": 0, "kept": 0}
+        self.totals = {"added": 0, "removed": 0, "kept": 0, "syncs": 0}
+
+    def sync(self, callback, bindings: dict[str, tuple]):
+        """Registers callback(*args) for each hotkey -> args pair in bindings, and removes all other hotkeys."""
+
+        added = removed = kept = 0
+
+        for hotkey, (args, handle) in list(self.bindings.items()):
+            if bindings.get(hotkey) == args:
+                kept += 1
+                continue
+
+            hotkeyHooks.remove(handle)
+            del self.bindings[hotkey]
+            removed += 1
+
+        for hotkey, args in bindings.items():
+            if hotkey in self.bindings:
+                continue
+
+            self.bindings[hotkey] = (args, hotkeyHooks.add(hotkey, callback, args))
+            added += 1
+
+        self.lastSync = {"added": added, "removed": removed, "kept": kept}
+        for key, value in self.lastSync.items():
+            self.totals[key] += value
+        self.totals["syncs"] += 1
+
+        if DEBUGMODE:
+            print(f"Hotkeys synced: {self.lastSync}")
+
+    def clear(self):
+        for args, handle in self.bindings.values():
+            hotkeyHooks.remove(handle)
+
+        self.bindings.clear()
+
+
 class TriggerKeyManager:
     def __init__(self, activeProfile):
-        self.loadedTriggerKeys: list[str] = []
+        self.loadedTriggerKeys: list = []  # Handles returned by hotkeyHooks.add.
+        self.triggerKeyNames: list[str] = []  # The trigger keys of the open pie menu, loaded or still to be loaded.
         self.triggerKey = None
         self.sameTKeyHKey = None
         self.triggeredPieSlice = None
 
         self.activeProfile = activeProfile
 
-        activeProfile.timerKeyHeld.timeout.connect(self.launchByTriggerKey)
+        activeProfile.timerKeyHeld.connect(self.launchByTriggerKey)
 
     def loadTriggerKeys(self):
         # enable the following logic if hotkeys and triggerkeys are allowed to be same/clash.
@@ -98,21 +351,25 @@ class TriggerKeyManager:
             if slices.get("triggerkey", "None") == "None":
                 return
 
+            self.triggerKeyNames.append(slices["triggerkey"])
+
             if slices.get("triggerkey") == self.activeProfile.hotkeyManager.hotkeyPressed:
                 self.sameTKeyHKey = slices
                 continue
 
-            keyboard.add_hotkey(slices["triggerkey"], self.registerTKeyEvent, suppress=True,
-                                args=[slices["triggerkey"], slices])
-            self.loadedTriggerKeys.append(slices["triggerkey"])
+            self.loadedTriggerKeys.append(hotkeyHooks.add(slices["triggerkey"], self.postTKeyEvent,
+                                                          [slices["triggerkey"], slices]))
 
     def loadFinalTriggerKey(self):
         if self.sameTKeyHKey is None:
             return
 
-        keyboard.add_hotkey(self.sameTKeyHKey["triggerkey"], self.registerTKeyEvent, suppress=True,
-                            args=[self.sameTKeyHKey["triggerkey"], self.sameTKeyHKey])
-        self.loadedTriggerKeys.append(self.sameTKeyHKey["triggerkey"])
+        self.loadedTriggerKeys.append(hotkeyHooks.add(self.sameTKeyHKey["triggerkey"], self.postTKeyEvent,
+                                                      [self.sameTKeyHKey["triggerkey"], self.sameTKeyHKey]))
+
+    def postTKeyEvent(self, triggerKey, pie):
+        """Bound with hotkeyHooks.add(), so runs on the keyboard thread."""
+        self.activeProfile.hotkeyManager.dispatcher.post(self.registerTKeyEvent, triggerKey, pie)
 
     def registerTKeyEvent(self, triggerKey, pie):
         self.triggerKey = triggerKey
@@ -126,7 +383,12 @@ class TriggerKeyManager:
         self.activeProfile.resetAttributes()
 
     def resetAttributes(self):
+        # The hotkey registry only manages the profile hotkeys, so trigger keys are removed here.
+        for handle in self.loadedTriggerKeys:
+            hotkeyHooks.remove(handle)
+
         self.loadedTriggerKeys.clear()
+        self.triggerKeyNames.clear()
         self.activeProfile.hotkeyManager.loadHotkeys()
 
         self.triggerKey = None
@@ -137,37 +399,34 @@ class HotkeyManager:
     def __init__(self, activeProfile):
         self.activeProfile = activeProfile
 
-        self.loadedHotkeys: list[str] = []
+        self.hotkeyRegistry = HotkeyRegistry()
 
         self.hotkeyPressed = None
         self.hotkeyHandled = None
 
         self.hotkeyReleased = True
-        activeProfile.timerKeyHeld.timeout.connect(self.checkHeldKeyReleased)
+        activeProfile.timerKeyHeld.connect(self.checkHeldKeyReleased)
 
         self.hotkeyFunction = None
         self.hotkeyParameters = None
         self.hotkeyForPieMenu = None
 
-        self.timerCheckHotkey = QtCore.QTimer()
-        self.timerCheckHotkey.timeout.connect(partial(self.hotkeyEvent, self.activeProfile.window))
-        self.timerCheckHotkey.start(25)
+        # Hotkey callbacks come in on the keyboard thread, and are handed to the GUI thread from there.
+        self.dispatcher = EventDispatcher()
+        self.launchLatencies = deque(maxlen=256)  # Seconds from key-down to launching the pie menu.
 
         self.keyHeld = False
-        self.timer_checkKeyHeld = QtCore.QTimer()
-        self.timer_checkKeyHeld.timeout.connect(self.checkKeyHeld)
-
-        self.waitHKey = QtCore.QTimer()
-        self.waitHKey.timeout.connect(self.waitHKeyrelease)
-        self.hotkeyReleaseCounter = 0
+        self.timer_checkKeyHeld = scheduler.task("checkKeyHeld", 194,
+                                                 condition=lambda: self.activeProfile.window.menu is not None)
+        self.timer_checkKeyHeld.connect(self.checkKeyHeld)
 
     def loadHotkeys(self):
         """
-        Deletes old hotkeys. Afterwards, loops over each pie menu corresponding to the active window,
-        and adds their hotkeys if the menu is enabled.
+        Loops over each pie menu and hotkey of the active profile, and collects the enabled ones. Only the hotkeys
+        that differ from the ones already loaded get (un)registered.
         """
 
-        self.flushHotkeys()
+        bindings = {}
 
         for option in ("piemenus", "hotkeys"):
             if option not in self.activeProfile.profile:
@@ -180,35 +439,12 @@ class HotkeyManager:
                 args = (item["hotkey"], item) if option == "piemenus" else \
                     (item['hotkey'], None, item['function'], item.get("params"))
 
-                keyboard.add_hotkey(item["hotkey"],
-                                    self.registerHotkeyEvent,
-                                    suppress=True,
-                                    args=args)
-                self.loadedHotkeys.append(item["hotkey"])
+                bindings[item["hotkey"]] = args
 
-    def flushHotkeys(self):
-        if self.loadedHotkeys:
-            keyboard.unhook_all_hotkeys()
-
-        self.loadedHotkeys.clear()
+        self.hotkeyRegistry.sync(self.registerHotkeyEvent, bindings)
 
-    def registerActiveProfileHotkeys(self) -> list[str]:
-        hotkeys = []
-
-        def getProfileHotkeys(obj):
-            for item in obj:
-                if not item.get("enabled", True):
-                    continue
-
-                hotkeys.append(item["hotkey"])
-
-        if self.activeProfile.profile["label"] == "Default Profile":
-            return hotkeys
-
-        for option in ["piemenus", "hotkeys"]:
-            if option in self.activeProfile.profile:
-                getProfileHotkeys(self.activeProfile.profile[option])
-        return hotkeys
+    def flushHotkeys(self):
+        self.hotkeyRegistry.clear()
 
     def runHotkey(self):
         if not self.hotkeyFunction or self.hotkeyFunction.lower() == "none":
@@ -225,22 +461,29 @@ class HotkeyManager:
 
     def registerHotkeyEvent(self, hotkey: str, pieMenu=None, function=None, params=None):
         """
-        Registers a hotkey when pressed. Bound to keyboard.add_hotkey().
+        Registers a hotkey when pressed. Bound with hotkeyHooks.add(), so this runs on the keyboard thread
+        and only passes the event on to the GUI thread.
         Requires either a pieMenu, or a function and its potential parameters - in case of a standalone hotkey.
         """
 
+        self.dispatcher.post(self.handleHotkeyEvent, perf_counter(), hotkey, pieMenu, function, params)
+
+    def handleHotkeyEvent(self, pressedAt: float, hotkey: str, pieMenu=None, function=None, params=None):
         self.hotkeyPressed = hotkey
         self.hotkeyForPieMenu = bool(pieMenu)
 
         if self.hotkeyForPieMenu:
             self.activeProfile.displayManager.openPieMenu = pieMenu
+            self.hotkeyEvent(self.activeProfile.window, pressedAt)
             return
 
         self.hotkeyFunction = function
         self.hotkeyParameters = params
         self.hotkeyHandled = False
 
-    def hotkeyEvent(self, window):
+        self.hotkeyEvent(self.activeProfile.window, pressedAt)
+
+    def hotkeyEvent(self, window, pressedAt: float = None):
         if self.hotkeyPressed is None:
             return
 
@@ -254,9 +497,19 @@ class HotkeyManager:
             return
 
         if not window.menu and self.hotkeyReleased:
+            if pressedAt is not None:
+                self.launchLatencies.append(perf_counter() - pressedAt)
+
             self.activeProfile.displayManager.launchPieMenu()
 
+    def medianLaunchLatency(self) -> float | None:
+        """Median time in ms between pressing a pie menu hotkey and launching the menu."""
+
+        return median(self.launchLatencies) * 1000 if self.launchLatencies else None
+
     def checkKeyHeld(self):
+        self.timer_checkKeyHeld.stop()
+
         if not self.activeProfile.window.menu:
             # If right click is pressed immediately after opening pie menus, currentMousePos becomes None,
             # and this causes errors, so better check if pie menu is open or not.
@@ -264,42 +517,39 @@ class HotkeyManager:
 
         mouseInCircle = self.activeProfile.window.menu.menuPresenter.checkMouseInCircle()
 
-        self.keyHeld = keyboard.is_pressed(self.hotkeyPressed) or not mouseInCircle
+        self.keyHeld = self.activeProfile.keyStates.isHeld(self.hotkeyPressed) or not mouseInCircle
 
         if not self.keyHeld:
             self.activeProfile.triggerKeyManager.loadFinalTriggerKey()
-        self.timer_checkKeyHeld.stop()
+            return
 
-    def checkHeldKeyReleased(self):
-        if self.keyHeld and keyboard.is_pressed(self.hotkeyPressed):
-            pass
-        elif not self.keyHeld:
-            if not self.activeProfile.window.menu:
-                self.activeProfile.resetAttributes()
-        else:
-            self.activeProfile.window.releasedHeldKey()
-            self.activeProfile.resetAttributes()
+        # Launches the selected slice as soon as the key goes up, or right away if it already has.
+        self.activeProfile.keyStates.onRelease(self.hotkeyPressed, self.heldKeyReleased)
 
-    def waitHKeyrelease(self):
-        if self.hotkeyPressed is None:
-            self.hotkeyForPieMenu = None
-            self.hotkeyFunction = None
-            self.hotkeyParameters = None
-            self.hotkeyReleased = True
-            self.waitHKey.stop()
+    def heldKeyReleased(self):
+        if not self.keyHeld:
             return
 
-        self.hotkeyReleaseCounter += int(self.hotkeyReleaseCounter < 100)
+        self.activeProfile.window.releasedHeldKey()
+        self.activeProfile.resetAttributes()
 
-        if (not keyboard.is_pressed(self.hotkeyPressed)) and self.hotkeyReleaseCounter >= 6:
-            self.hotkeyForPieMenu = None
-            self.hotkeyFunction = None
-            self.hotkeyParameters = None
-            self.hotkeyPressed = None
-            self.hotkeyReleased = True
-            self.waitHKey.stop()
+    def checkHeldKeyReleased(self):
+        # Releasing a held hotkey is handled by heldKeyReleased, this only cleans up after menus closed otherwise.
+        if not self.keyHeld and not self.activeProfile.window.menu:
+            self.activeProfile.resetAttributes()
+
+    def hotkeyReleasedAfterMenu(self):
+        self.hotkeyForPieMenu = None
+        self.hotkeyFunction = None
+        self.hotkeyParameters = None
+        self.hotkeyPressed = None
+        self.hotkeyReleased = True
 
     def resetAttributes(self):
+        keyStates = self.activeProfile.keyStates
+        keyStates.cancelRelease(self.heldKeyReleased)
+        keyStates.cancelRelease(self.hotkeyReleasedAfterMenu)
+
         self.hotkeyForPieMenu = None
         self.hotkeyFunction = None
         self.hotkeyParameters = None
@@ -307,9 +557,12 @@ class HotkeyManager:
         self.hotkeyHandled = None
         self.keyHeld = False
 
+        # No new pie menu until the hotkey that opened the last one is let go.
         self.hotkeyReleased = False
-        self.hotkeyReleaseCounter = 0
-        self.waitHKey.start(25)
+        if self.hotkeyPressed is None:
+            self.hotkeyReleasedAfterMenu()
+        else:
+            keyStates.onRelease(self.hotkeyPressed, self.hotkeyReleasedAfterMenu)
 
 
 class InputManager:
@@ -320,10 +573,37 @@ class InputManager:
         self.isLMBup = False
         self.isWheel = False
 
-        self.mouseThread = Thread(target=mousehook.mouseHook)
+        dispatcher = activeProfile.hotkeyManager.dispatcher
+        self.inputThread = mousehook.InputThread(wake=partial(dispatcher.post, self.drainMouseEvents),
+                                                 mouseHooked=partial(dispatcher.post, self.mouseHooked),
+                                                 heldKeys=activeProfile.keyStates.pressed)
         mousehook.mouseHandlers.append(self.regLowLevelMouseEvent)
+        mousehook.moveHandlers.append(activeProfile.window.llMouseMoveEvent)
+        mousehook.typeHandlers.append(activeProfile.window.llKeyTyped)
+
+        activeProfile.timerKeyHeld.connect(self.lowLevelMouseEvent)
+
+    def start(self):
+        self.inputThread.start()
+
+    def mouseHooked(self):
+        # Menus only stop polling the cursor once the hook reporting its moves is actually in place.
+        self.activeProfile.window.hookedCursor = True
+
+    def enableMouseHook(self):
+        # Mouse buttons only operate the pie menu while it's open. They still reach the app underneath, as they always
+        # did, the hook only reports them.
+        self.inputThread.setMouseEnabled(True)
 
-        activeProfile.timerKeyHeld.timeout.connect(self.lowLevelMouseEvent)
+        # Scripted menus can be filtered by typing, so keys go to the menu instead of the app while one is open. The
+        # typing hook is installed now, after the keyboard library's, so it sees keys first and the menu's trigger keys
+        # have to be let through to the library.
+        menu = self.activeProfile.window.menu
+        self.inputThread.setTypingEnabled(bool(menu and menu.acceptsTyping()),
+                                          mousehook.typedKeyCodes(self.activeProfile.triggerKeyManager.triggerKeyNames))
+
+    def drainMouseEvents(self):
+        self.inputThread.drain()
 
     def lowLevelMouseEvent(self):
         if self.isLMBup:
@@ -334,32 +614,25 @@ class InputManager:
             self.activeProfile.window.llWheelEvent(self.isWheel)
             self.isWheel = False
 
-    def regLowLevelMouseEvent(self, event) -> int:
-        # register low level mouse event
+    def regLowLevelMouseEvent(self, event):
+        # register low level mouse event, on the GUI thread.
         event_type = event.event_type
 
-        if event_type in ('RButton Down', 'LButton Down'):
-            return -1  # Block rmb and lmb down
-
         if event_type == 'RButton Up':
             self.isRMBup = True
-            return -1
+            return
 
         if event_type == 'LButton Up' and not self.activeProfile.hotkeyManager.keyHeld:
             self.isLMBup = True
-            return -1
-        if event_type == 'LButton Up' and self.activeProfile.hotkeyManager.keyHeld:
-            return -1
+            return
 
         if event_type == 'wheel':
             # scan code === lParam[1]
             self.isWheel = event
 
     def resetAttributes(self):
-        # stop thread and join in main thread
-        if self.mouseThread.is_alive():
-            windll.user32.PostThreadMessageW(self.mouseThread.ident, WM_QUIT, 0, 0)
-            self.mouseThread.join()
+        self.inputThread.setMouseEnabled(False)
+        self.inputThread.setTypingEnabled(False)
 
         self.isLMBup = False
         self.isRMBup = False
@@ -376,7 +649,7 @@ class DisplayManager:
 
         self.profile = activeProfile.profile
         self.timerKeyHeld = activeProfile.timerKeyHeld
-        self.timerKeyHeld.timeout.connect(self.menuCancel)
+        self.timerKeyHeld.connect(self.menuCancel)
 
     def changeDetected(self, activeWindow, handle_foreground):
         """
@@ -384,19 +657,18 @@ class DisplayManager:
         Otherwise, the global profile is loaded.
 
         Args:
-            activeWindow (QMainWindow): The new active self.activeProfile.window.
+            activeWindow (str | None): The window class of the new active window, None if it has no profile.
             handle_foreground (int): The id of the foreground self.activeProfile.window.
 
         """
 
         self.handle_foreground = handle_foreground
-        if activeWindow not in self.activeProfile.settingsManager.registeredApps:
+        if activeWindow is None:
             self.activeProfile.loadProfile(globalProfile=True)
             return
 
         self.activeWindow = activeWindow
         self.activeProfile.loadProfile()
-        self.activeProfile.appendProfileWithGeneralHotKeys()
         self.activeProfile.hotkeyManager.loadHotkeys()
 
     def launchPieMenu(self):
@@ -412,14 +684,13 @@ class DisplayManager:
 
         self.timerKeyHeld.start(25)
 
-        self.activeProfile.inputManager.mouseThread = Thread(target=mousehook.mouseHook)
-        self.activeProfile.inputManager.mouseThread.start()
+        self.activeProfile.inputManager.enableMouseHook()
 
         # 194 is a special value, do not change unless you what you are doing
         self.activeProfile.hotkeyManager.timer_checkKeyHeld.start(194)
 
     def menuCancel(self):
-        if keyboard.is_pressed('esc') or self.activeProfile.inputManager.isRMBup:
+        if self.activeProfile.keyStates.isHeld('esc') or self.activeProfile.inputManager.isRMBup:
             self.activeProfile.window.killMenu()
             self.resetAttributes()
 
@@ -429,8 +700,12 @@ class DisplayManager:
 
 class ActiveProfile:
     def __init__(self, settingsManager, window, mon_manager):
-        self.timerKeyHeld = QtCore.QTimer()
-        self.profile: dict | None = None
+        self.timerKeyHeld = scheduler.task("keyHeld", 25)
+        self.profile: MappingProxyType | None = None
+
+        self.keyStates = KeyStateTracker()  # Fed by the keyboard library's hook, before any hotkey can suppress a key.
+        self.keyStates.install()
+        self.profileCache = WindowProfileCache(settingsManager)
 
         self.settingsManager = settingsManager
         self.window = window
@@ -442,40 +717,19 @@ class ActiveProfile:
         self.displayManager = DisplayManager(self)
 
         self.loadProfile(globalProfile=True)
+        self.inputManager.start()
 
     def loadProfile(self, globalProfile=False):
+        """Selects the precompiled effective profile, with the general hotkeys and pie menus already merged in."""
+
         handle = "Default" if globalProfile else self.displayManager.activeWindow
 
-        self.profile = [p for p in self.settingsManager.appProfiles if
-                        p["ahkHandle"] == handle][0]
+        self.profile = self.settingsManager.effectiveProfiles[handle]
 
         if globalProfile:
             self.displayManager.activeWindow = None
             self.hotkeyManager.loadHotkeys()
 
-    def appendProfileWithGeneralHotKeys(self):
-        """
-        Adding global (or general) hotkeys and piemenus to the profile ones to load in one go,
-        unless the loaded profile contains a hotkey overriding the general entry.
-        """
-
-        globalProfile = [p for p in self.settingsManager.appProfiles if
-                         p["ahkHandle"] == "Default"][0]
-        currentHotkeys = self.hotkeyManager.registerActiveProfileHotkeys()
-
-        for option in ("piemenus", "hotkeys"):
-            for item in globalProfile.get(option, []):
-                if not item.get("general", True) or not item.get("enabled", True):
-                    continue
-
-                if item["hotkey"] in currentHotkeys:  # Key is overwritten/reserved by specific profile.
-                    continue
-
-                if option not in self.profile:
-                    self.profile[option] = []
-
-                self.profile[option].append(item)
-
     def resetAttributes(self):
         self.timerKeyHeld.stop()
 
@@ -485,19 +739,22 @@ class ActiveProfile:
         self.displayManager.resetAttributes()
 
 
-def detectWindowChange(activeProfile):
-    previousActiveWindow = activeProfile.displayManager.activeWindow
-    try:
-        handle_foreground = w32gui.GetForegroundWindow()
-    # except pywin32.error as e:
-    except Exception as e:
-        print(e)
+def detectWindowChange(activeProfile, handle_foreground=None):
+    """Bound to ForegroundWatcher.foregroundChanged, which passes the new foreground handle along."""
+
+    if handle_foreground is None:
+        try:
+            handle_foreground = w32gui.GetForegroundWindow()
+        # except pywin32.error as e:
+        except Exception as e:
+            print(e)
 
-        sys.exit(-1)
+            sys.exit(-1)
 
-    activeWindow = w32gui.GetClassName(handle_foreground)
+    activeWindow, profile = activeProfile.profileCache.resolve(handle_foreground)
 
-    if previousActiveWindow == activeWindow:
+    if profile is activeProfile.profile:  # E.g. switching between two windows that both use the default profile.
+        activeProfile.displayManager.handle_foreground = handle_foreground
         return
 
     activeProfile.displayManager.changeDetected(activeWindow, handle_foreground)
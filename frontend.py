@@ -1,19 +1,27 @@
+from buttonstyle import buttonStyle
+from iconcache import iconCache
+from optionindex import indexFor
 import pieFunctions
+from scheduler import scheduler
+from scriptedmenus import scriptedMenuProvider
 from settings.menuScripts.menuScript import MenuOption
-from settings.pie_themes import pie_themes, pie_selection_theme
+from settings.pie_themes import pie_selection_theme
 
-import os
-from queue import Queue
-from time import sleep
-from threading import Thread
+from bisect import bisect
+from collections import defaultdict, deque, OrderedDict
+from functools import lru_cache, partial
+from math import atan2, ceil, cos, hypot, pi, sin, tau
+from statistics import median, quantiles
+from time import perf_counter
 
-import iconify
 from PySide2 import QtGui, QtWidgets, QtCore
 
 
-script_dir = os.path.dirname(__file__)
-icons_dir = os.path.join(script_dir, "resources/icons/")
 transparent = QtGui.QColor(255, 255, 255, 0)
+FRAME_INTERVAL = 16  # ms, used when the refresh rate of the screen isn't known.
+SUBMENU_DWELL = 250  # ms a button has to stay selected before its submenu opens, unless set in the global settings.
+SCRIPTED_PAGE_SIZE = 12  # Slices of a scripted menu shown at once, unless set in the global settings.
+SECTOR_SLACK = 3  # px a hover distance can be under the ray it is bounded by, as positions are rounded to pixels.
 
 
 def getWidgetCenterPos(widget):
@@ -61,10 +69,70 @@ def getButtons(button, checkIfChildrenActive=False):
     return button.subMenu.buttons
 
 
+def isPoolable(openPieMenu) -> bool:
+    # The slices of scripted menus can change every time they are opened, so those are always rebuilt.
+    return not any(slice.get("function") == 'scriptedMenu' for slice in openPieMenu.get("slices", ()))
+
+
+class MenuPool:
+    """
+    Keeps built RadialMenus around after they're closed, keyed by the pie menu they show, so opening the same pie menu
+    again only has to re-arm it instead of building every button again. Least recently used menus are evicted once
+    more than maxSize menus are kept.
+    """
+
+    def __init__(self, maxSize: int = 8):
+        self.maxSize = maxSize
+        self.menus: OrderedDict[int, RadialMenu] = OrderedDict()
+
+    def acquire(self, window, openPieMenu, summonPosition, globalSettings) -> tuple["RadialMenu", bool]:
+        """Returns a menu ready to be shown, and whether it was reused."""
+
+        key = id(openPieMenu)
+        menu = self.menus.get(key)
+
+        # The effective profiles are immutable and rebuilt on every settings reload, so their identity is enough.
+        if menu is not None and menu.openPieMenu is openPieMenu and menu.globalSettings is globalSettings:
+            self.menus.move_to_end(key)
+            menu.rearm(summonPosition)
+            return menu, True
+
+        if menu is not None:
+            self.evict(key)
+
+        menu = RadialMenu(window, summonPosition, openPieMenu, globalSettings)
+
+        if isPoolable(openPieMenu):
+            menu.pooled = True
+            self.menus[key] = menu
+
+            while len(self.menus) > self.maxSize:
+                self.evict(next(iter(self.menus)))
+
+        return menu, False
+
+    def evict(self, key: int):
+        menu = self.menus.pop(key)
+        menu.pooled = False
+
+        if menu.parent().menu is not menu:  # An open menu is destroyed once it's closed.
+            menu.dispose()
+
+
 class Window(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
         self.menu = None
+        self.menuPool = MenuPool()
+
+        # Set once mouse moves are delivered by the input hook (see llMouseMoveEvent). Until then the open menu polls
+        # the cursor position.
+        self.hookedCursor = False
+
+        # Seconds from showMenu() being called to the menu being shown, for new and for reused menus.
+        self.openTimings = {"first": deque(maxlen=100), "reopen": deque(maxlen=100)}
+        # Seconds each paint of the menu overlay took, per theme (see MenuPresenter.paintEvent).
+        self.paintTimings: dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
 
         self.setWindowFlags(QtCore.Qt.FramelessWindowHint | QtCore.Qt.WindowStaysOnTopHint | QtCore.Qt.Tool)
         self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
@@ -75,9 +143,31 @@ class Window(QtWidgets.QWidget):
             self.menu.kill()
             return
 
-        self.menu = RadialMenu(self, summonPosition, openPieMenu, globalSettings)
+        start = perf_counter()
+
+        self.menu, reused = self.menuPool.acquire(self, openPieMenu, summonPosition, globalSettings)
         self.menu.show()
 
+        self.openTimings["reopen" if reused else "first"].append(perf_counter() - start)
+
+    def openLatencies(self) -> dict[str, float | None]:
+        """Median time in ms to open a newly built menu, and a menu reused from the pool."""
+
+        return {kind: median(timings) * 1000 if timings else None for kind, timings in self.openTimings.items()}
+
+    def paintTimePercentiles(self) -> dict[str, dict[str, float]]:
+        """The 50th, 90th and 99th percentile in ms of the overlay's paint time, per theme."""
+
+        percentiles = {}
+        for themeName, timings in self.paintTimings.items():
+            if len(timings) < 2:
+                continue
+
+            cuts = quantiles(timings, n=100)
+            percentiles[themeName] = {"p50": cuts[49] * 1000, "p90": cuts[89] * 1000, "p99": cuts[98] * 1000}
+
+        return percentiles
+
     def killMenu(self):
         if self.menu:
             self.menu.kill()
@@ -106,7 +196,17 @@ class Window(QtWidgets.QWidget):
     def llWheelEvent(self, event):
         if self.menu is None:
             return
-        self.menu.llWheelEvent(event)
+        self.menu.ioHandler.llWheelEvent(event)
+
+    def llMouseMoveEvent(self):
+        if self.menu is None:
+            return
+        self.menu.ioHandler.globalMouseMoveEvent()
+
+    def llKeyTyped(self, character: str):
+        if self.menu is None:
+            return
+        self.menu.typeFilter(character)
 
 
 class SubMenu:
@@ -116,7 +216,13 @@ class SubMenu:
 
         self.buttons = []
         self.open = False
+        self.built = False  # The buttons are only built once they're about to be needed, see ensureBuilt().
+
+    def ensureBuilt(self):
+        if self.built:
+            return
 
+        self.built = True
         self.createSubMenu()
 
     def createSubMenu(self):
@@ -130,6 +236,8 @@ class SubMenu:
             self.buttons.append(button)
 
     def updateSubMenuButtons(self, parentAngle: float):
+        self.ensureBuilt()
+
         for index, button in enumerate(self.buttons):
             maxAngle = 180  # TODO: Fix this (try other values).
 
@@ -148,26 +256,10 @@ class SubMenu:
             button.show()
             button.move(line.p2().toPoint().x(), line.p2().toPoint().y())
 
-    def checkButtonHoverHeld(self, parentAngle: float):
-        initialButton = self.radialMenu.selectedButton
-
-        otherSelected = False
-        for _ in range(5):
-            sleep(0.05)
-
-            try:
-                if self.radialMenu.selectedButton != initialButton:
-                    otherSelected = True
-            except RuntimeError:
-                return  # Occurs when menu is closed before timer is done.
-
-        if not otherSelected:
-            self.open = True
-
-            self.updateSubMenuButtons(parentAngle)
+        self.radialMenu.menuPresenter.buildSectors(self.parentButton, self.buttons)
 
     def showSubMenu(self, parentAngle: float):
-        Thread(target=self.checkButtonHoverHeld, args=(parentAngle,)).start()
+        self.radialMenu.menuPresenter.hoverIntent.arm(self, parentAngle)
 
     def hideSubMenu(self):
         self.open = False
@@ -195,11 +287,13 @@ class Button(QtWidgets.QPushButton):
         self.icon = None
         self.svg_changes_color = False
 
+        # Painted from the compiled theme (see paintEvent), so hover and press changes only need a repaint.
+        self.buttonStyle = buttonStyle(openPieMenu.get("theme"))
+        self.setFont(self.buttonStyle.font)
+
         if slice.get("icon"):
             self.findIcon(globalSettings, openPieMenu)
 
-        self.setStyleSheet(pie_themes.get(openPieMenu.get("theme"), pie_themes.dhalu_theme))
-
         if self.slice.get("onPie_w_up") or self.slice.get("onPie_w_down"):
             self.wheelEvent = self.optionalWheelEvent
 
@@ -213,58 +307,66 @@ class Button(QtWidgets.QPushButton):
         self.opacityAnim = None
 
     def findIcon(self, globalSettings, openPieMenu):
-        icon = os.path.join(icons_dir, self.slice.get("icon").strip())
-        if not os.path.exists(icon):
-            icon = os.path.join(icons_dir, "default.svg")
+        iconName = self.slice.get("icon").strip()
+        icon = iconCache.resolvePath(iconName)
+        size, dpr = self.iconSize(), self.devicePixelRatioF()
 
         self.setText(globalSettings.get("icon-padding-right") + self.text())
-        if self.slice.get("icon").strip()[-4:] == ".svg":
-            try:  # TODO: See if this can be transformed into if statement, else check error type.
-                svg_nohover_hover = pie_selection_theme.get(openPieMenu.get("theme")).get("svg_nohover_hover")
-                nohover_col, hover_col = svg_nohover_hover.strip().split("_")
-                self.nohover_icon = iconify.Icon(icon, color=QtGui.QColor(nohover_col))
-                self.hover_icon = iconify.Icon(icon, color=QtGui.QColor(hover_col))
-                self.svg_changes_color = True
-                icon = self.nohover_icon
-            except:
-                icon = iconify.Icon(icon)
-
-        self.icon = icon
-        self.setIcon(QtGui.QIcon(icon))
+
+        theme = pie_selection_theme.get(openPieMenu.get("theme"))
+        svg_nohover_hover = theme.get("svg_nohover_hover") if theme else None
+
+        if iconName[-4:] == ".svg" and svg_nohover_hover:
+            nohover_col, hover_col = svg_nohover_hover.strip().split("_")
+            self.nohover_icon = iconCache.icon(icon, nohover_col, size, dpr)
+            self.hover_icon = iconCache.icon(icon, hover_col, size, dpr)
+            self.svg_changes_color = True
+            self.icon = self.nohover_icon
+        else:
+            self.icon = iconCache.icon(icon, None, size, dpr)
+
+        self.setIcon(self.icon)
 
     def setHover(self, newHoverState):
         if self.svg_changes_color:
-            self.setIcon(self.nohover_icon if newHoverState else self.hover_icon)
+            icon = self.nohover_icon if newHoverState else self.hover_icon
+            if icon is not self.icon:
+                self.icon = icon
+                self.setIcon(icon)
 
         if self.isHovered == newHoverState:
             return
 
         self.isHovered = newHoverState
-        self.setProperty("hover", newHoverState)
-
-        self.style().unpolish(self)
-        self.style().polish(self)
+        self.layoutChanged()  # The hover segment of a hovered button runs back to where it came from.
+        self.update()
 
         if not self.subMenu:  # TODO: Left off here. SubMenu doesn't always get registered.
             return
 
         if newHoverState and not self.subMenu.open:
             line = QtCore.QLineF(self.targetPos, self.parent().summonPos)
-
-            queue = Queue()
-            thread = Thread(target=lambda f, a: queue.put(f(a)),
-                            args=(self.subMenu.showSubMenu, line.angle()))
-            thread.start()
-            thread.join()
+            self.subMenu.showSubMenu(line.angle())
         elif not newHoverState and self.subMenu.open:
             self.subMenu.hideSubMenu()
 
     def setPress(self, value):
         if self.isPressed != value:
             self.isPressed = value
-            self.setProperty("pressed", value)
-            self.style().unpolish(self)
-            self.style().polish(self)
+            self.update()
+
+    def sizeHint(self) -> QtCore.QSize:
+        return self.buttonStyle.sizeHint(self.fontMetrics(), self.text(), self.iconSize() if self.icon else None)
+
+    def minimumSizeHint(self) -> QtCore.QSize:
+        return self.sizeHint()
+
+    def paintEvent(self, event):
+        state = self.buttonStyle.state(self.isHovered, self.isPressed or self.isDown())
+        pixmap = self.icon.pixmap(self.iconSize()) if self.icon else None
+
+        painter = QtGui.QPainter(self)
+        self.buttonStyle.paint(painter, self.rect(), state, self.text(), pixmap)
 
     def animate(self, startPos, endPos, start=True, duration=200):
         self.parallelAnim = QtCore.QParallelAnimationGroup()
@@ -288,6 +390,22 @@ class Button(QtWidgets.QPushButton):
 
         return [self.posAnim, self.opacityAnim]
 
+    def layoutChanged(self):
+        if isinstance(self.parent(), RadialMenu):
+            self.parent().menuPresenter.buttonMoved()
+
+    def moveEvent(self, event):
+        super().moveEvent(event)
+        self.layoutChanged()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.layoutChanged()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.layoutChanged()
+
     def enterEvent(self, event) -> None:
         self.actuallyHovered = True
 
@@ -332,10 +450,85 @@ class Button(QtWidgets.QPushButton):
         pieFunctions.FUNCTIONS[pie_func](params)
 
 
+def placeholderSlice(label: str) -> dict:
+    """Stands in for the slices of a scripted menu that has no results to show (yet)."""
+
+    return {"label": label, "function": "none", "params": [], "placeholder": True}
+
+
+class ScriptedGroup:
+    """
+    The options of one scripted menu slice, and which of them are shown: a page of pageSize options, out of the ones
+    matching the typed filter. Only the shown options get buttons, however many the script returned.
+    """
+
+    def __init__(self, options: list[dict] | None, pageSize: int):
+        self.options = options or []
+        self.pageSize = pageSize
+        self.buttons: list[Button] = []
+        self.streaming = False  # Showing the partial results of the script's current run.
+
+        self.status = "Loading..." if options is None else "Nothing to show"
+        self.query = ""
+        self.matches: list[int] | None = None  # Indices of the options matching the query, None without a query.
+        self.page = 0
+
+        self._placeholder = None
+
+    def setOptions(self, options: list[dict], streaming: bool):
+        self.options, self.streaming = options, streaming
+        self.status = "Nothing to show"
+        self.applyQuery()
+
+    def setFailed(self):
+        self.status = "Script failed"
+
+    def setQuery(self, query: str):
+        self.query = query
+        self.page = 0
+        self.applyQuery()
+
+    def applyQuery(self):
+        self.matches = indexFor(self.options).search(self.query) if self.query and self.options else None
+        self.page = min(self.page, self.pageCount() - 1)
+
+    def matchCount(self) -> int:
+        return len(self.matches) if self.matches is not None else len(self.options)
+
+    def pageCount(self) -> int:
+        return max(1, ceil(self.matchCount() / self.pageSize))
+
+    def turnPage(self, step: int) -> bool:
+        page = min(max(self.page + step, 0), self.pageCount() - 1)
+        changed, self.page = page != self.page, page
+        return changed
+
+    def visibleSlices(self) -> list[dict]:
+        start = self.page * self.pageSize
+
+        if self.matches is None:
+            visible = self.options[start:start + self.pageSize]
+        else:
+            visible = [self.options[index] for index in self.matches[start:start + self.pageSize]]
+
+        if visible:
+            return visible
+
+        status = "No matches" if self.query and self.options else self.status
+        if self._placeholder is None or self._placeholder["label"] != status:
+            self._placeholder = placeholderSlice(status)  # Kept, so its button isn't rebuilt on every update.
+
+        return [self._placeholder]
+
+
 class MenuBuilder:
     def __init__(self, radialMenu):
         self.radialMenu = radialMenu
 
+        # The options and buttons of every scripted menu slice, updated in place when its script's results come in.
+        self.scriptedGroups: list[ScriptedGroup] = []
+        self.scriptedRequests = []
+
     def buildMenu(self) -> list[Button]:
         slices = self.radialMenu.openPieMenu.get("slices")
 
@@ -358,12 +551,23 @@ class MenuBuilder:
         return buttons
 
     def generateSSGButtons(self, ssgData: dict) -> list[Button]:
-        menuOptions = pieFunctions.scriptedMenu(ssgData['params'])
+        """
+        Builds the buttons of a scripted menu from its cached results, or a placeholder if there are none. The script
+        is run in the background, see RadialMenu.updateScriptedButtons.
+        """
+
+        group = len(self.scriptedGroups)
+        menuOptions, request = scriptedMenuProvider.request(ssgData['params'],
+                                                            partial(self.radialMenu.updateScriptedButtons, group))
+        if request:
+            self.scriptedRequests.append(request)
 
-        if not menuOptions:
-            pass  # TODO: Pop-up if empty.
+        pageSize = self.radialMenu.globalSettings.get("scriptedPageSize") or SCRIPTED_PAGE_SIZE
+        scripted = ScriptedGroup(menuOptions, pageSize)
+        scripted.buttons = [self.buildButton(menuOption) for menuOption in scripted.visibleSlices()]
+        self.scriptedGroups.append(scripted)
 
-        return [self.buildButton(menuOption.toDict()) for menuOption in menuOptions]
+        return scripted.buttons
 
     def buildButton(self, data: dict) -> Button:
         """Creates the buttons, one for each slice of the pieMenu, and their potential children."""
@@ -376,6 +580,84 @@ class MenuBuilder:
         return button
 
 
+@lru_cache(maxsize=None)
+def selectionPens(themeName: str | None) -> tuple[QtGui.QPen, QtGui.QPen, QtGui.QPen]:
+    """
+    The pens of the centre ring, the arc and the tracking line of a selection theme. Themes that don't define all of
+    bg_circle, fg_circle and thickness use the default selection theme.
+    """
+
+    theme = pie_selection_theme.get(themeName) if themeName and themeName.lower() not in ("none", "null") else None
+    if not theme or not all(key in theme for key in ("bg_circle", "fg_circle", "thickness")):
+        theme = pie_selection_theme.default
+
+    bgCirclePen = QtGui.QPen(QtGui.QColor(theme["bg_circle"]), theme["thickness"])
+    fgCirclePen = QtGui.QPen(QtGui.QColor(theme["fg_circle"]), theme["thickness"])
+
+    linePen = QtGui.QPen(fgCirclePen)
+    linePen.setCapStyle(QtCore.Qt.RoundCap)
+
+    return bgCirclePen, fgCirclePen, linePen
+
+
+@lru_cache(maxsize=32)
+def ringPixmap(themeName: str | None, radius: int, devicePixelRatio: float) -> QtGui.QPixmap:
+    """The background circle of the centre ring, drawn once per theme, radius and pixel ratio."""
+
+    bgCirclePen = selectionPens(themeName)[0]
+    center = radius + bgCirclePen.width() // 2 + 2  # Room for the pen and antialiasing around the circle.
+
+    pixmap = QtGui.QPixmap(QtCore.QSize(center * 2, center * 2) * devicePixelRatio)
+    pixmap.setDevicePixelRatio(devicePixelRatio)
+    pixmap.fill(QtCore.Qt.transparent)
+
+    painter = QtGui.QPainter(pixmap)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing, on=True)
+    painter.setPen(bgCirclePen)
+    painter.drawEllipse(QtCore.QRect(center - radius, center - radius, radius * 2, radius * 2))
+    painter.end()
+
+    return pixmap
+
+
+class HoverIntent:
+    """
+    Opens a submenu once its button stayed selected for the dwell time. Everything happens on the GUI thread: a
+    scheduler task is armed when the button is hovered, and cancelled as soon as the selection changes.
+    """
+
+    def __init__(self, radialMenu):
+        self.radialMenu = radialMenu
+
+        self.subMenu = None
+        self.parentAngle = 0.0
+
+        self.task = scheduler.task("hoverIntent", SUBMENU_DWELL)
+
+    def arm(self, subMenu, parentAngle: float):
+        self.cancel()
+
+        self.subMenu, self.parentAngle = subMenu, parentAngle
+        self.task.connect(self.fire)
+        self.task.start(self.radialMenu.globalSettings.get("subMenuDwell") or SUBMENU_DWELL)
+
+    def cancel(self):
+        if self.subMenu is None:
+            return
+
+        self.task.disconnect(self.fire)
+        self.task.stop()
+        self.subMenu = None
+
+    def fire(self):
+        subMenu, parentAngle = self.subMenu, self.parentAngle
+        self.cancel()
+
+        if self.radialMenu.selectedButton is subMenu.parentButton:
+            subMenu.open = True
+            subMenu.updateSubMenuButtons(parentAngle)
+
+
 class MenuPresenter:
     def __init__(self, radialMenu):
         self.radialMenu = radialMenu
@@ -388,6 +670,49 @@ class MenuPresenter:
         self._prevSelectedBtn = None
         self.animGroup = None
 
+        self.hoverIntent = HoverIntent(radialMenu)
+
+        # Per group of buttons (keyed by the parent button, None for the pie menu itself), the angles of the buttons as
+        # seen from the summon position, sorted, the (order in the group, button) at each, how close to the summon
+        # position the nearest one is, and the order of each button. Hover segments point away from the summon position
+        # (but the selected submenu button's, see findSelectedButton()), so hovering doesn't change the angles, and a
+        # group's table is only built when the group is laid out, see buildSectors().
+        self._sectorTables: dict[object, tuple[list[float], list[tuple[int, object]], float, dict[object, int]]] = {}
+
+        # Only the parts of the overlay that changed are repainted, at most once per display frame.
+        self._indicatorRect = QtCore.QRect()  # Centre ring and tracking line, as last drawn.
+        self._dirtyRegion = QtGui.QRegion()
+        self._lastFrame = 0.0
+
+        screen = QtGui.QGuiApplication.primaryScreen()
+        self.frameInterval = round(1000 / screen.refreshRate()) if screen and screen.refreshRate() else FRAME_INTERVAL
+        self.frameTask = scheduler.task("menuFrame", self.frameInterval)
+
+        # Prepared once per open by prepareRing(), so painting a frame only draws the arc and the line.
+        self._themeName = None
+        self._pens = None
+        self._ringPixmap = None
+        self._ringOrigin = QtCore.QPoint()
+        self._circleRect = QtCore.QRect()
+
+    def resetSelection(self):
+        self._selectedBtnParent = None
+        self._selectedBtnParentInitPos = None
+        self._selectedBtnInitPos = None
+        self._prevSelectedBtn = None
+
+    def buttonMoved(self):
+        # The debug lines end at the buttons, so they're drawn again wherever the buttons go, e.g. while animating.
+        if self.radialMenu.globalSettings.get("debugDraw") and self.radialMenu.isVisible():
+            self.requestRepaint(self.radialMenu.rect())
+
+    def resetRepaint(self):
+        self.frameTask.disconnect(self.flushRepaint)
+        self.frameTask.stop()
+
+        self._indicatorRect = QtCore.QRect()
+        self._dirtyRegion = QtGui.QRegion()
+
     def setButtonPositions(self):
         offset_angle = -self.radialMenu.openPieMenu.get("offset_angle", 0)
         angle = 360 / len(self.radialMenu.buttons)
@@ -418,6 +743,10 @@ class MenuPresenter:
             button.move(line.p2().toPoint() - pos)
             button.targetPos = line.p2().toPoint()
 
+        # The submenus are laid out around their parent, so they're built again when they're shown.
+        self._sectorTables.clear()
+        self.buildSectors(None, self.radialMenu.buttons)
+
     def fixSummonPosition(self, pos):  # TODO: What does this do?
         minSpaceToBorder = int(self.radialMenu.globalSettings["savePadding"]) + self._outRadius
         maxX = self.radialMenu.rect().width() - minSpaceToBorder
@@ -503,6 +832,7 @@ class MenuPresenter:
 
         self._prevSelectedBtn, self.radialMenu.selectedButton = self.radialMenu.selectedButton, targetButton
         self._selectedBtnInitPos = self.radialMenu.selectedButton.pos()
+        self.hoverIntent.cancel()
 
         # Move button to hover position.
         if not isChild(self._prevSelectedBtn,
@@ -524,21 +854,68 @@ class MenuPresenter:
 
             button.setHover(button is self.radialMenu.selectedButton)
 
-    def getTheme(self) -> tuple[QtGui.QPen, QtGui.QPen]:
-        if "theme" in self.radialMenu.openPieMenu and self.radialMenu.openPieMenu["theme"].lower() not in (
-                "", "none", "null"):
-            theme = pie_selection_theme[self.radialMenu.openPieMenu["theme"]]
-            bgCirclePen = QtGui.QPen(QtGui.QColor(theme["bg_circle"]),
-                                     theme["thickness"])
-            fgCirclePen = QtGui.QPen(QtGui.QColor(theme["fg_circle"]),
-                                     theme["thickness"])
-        else:
-            bgCirclePen = QtGui.QPen(QtGui.QColor(pie_selection_theme.default["bg_circle"]),
-                                     pie_selection_theme.default["thickness"])
-            fgCirclePen = QtGui.QPen(QtGui.QColor(pie_selection_theme.default["fg_circle"]),
-                                     pie_selection_theme.default["thickness"])
+    def indicatorRect(self) -> QtCore.QRect:
+        """The area the centre ring and the tracking line are drawn in, see paintEvent."""
+
+        summonPos = self.radialMenu.summonPos
+        rect = QtCore.QRect(summonPos.x() - self._inRadius, summonPos.y() - self._inRadius,
+                            self._inRadius * 2, self._inRadius * 2)
 
-        return bgCirclePen, fgCirclePen
+        if self.radialMenu.globalSettings["useLineOnHover"] and not self.checkMouseInCircle():
+            rect = rect.united(QtCore.QRect(summonPos, self.radialMenu.currentMousePos).normalized())
+
+        margin = self._pens[0].width() + 2  # Half the pen on each side, plus antialiasing.
+        return rect.adjusted(-margin, -margin, margin, margin)
+
+    def cursorMoved(self):
+        """Repaints where the indicator was and where it is now. Buttons repaint themselves when they move."""
+
+        if self.radialMenu.globalSettings.get("debugDraw"):
+            self.requestRepaint(self.radialMenu.rect())  # The debug lines reach every button.
+            return
+
+        newRect = self.indicatorRect()
+        self.requestRepaint(self._indicatorRect.united(newRect))
+        self._indicatorRect = newRect
+
+    def requestRepaint(self, rect: QtCore.QRect):
+        """Adds rect to the area to repaint, which is flushed right away or once the current frame is over."""
+
+        self._dirtyRegion += rect
+
+        if self.frameTask.isActive():
+            return
+
+        sinceLastFrame = (perf_counter() - self._lastFrame) * 1000
+        if sinceLastFrame >= self.frameInterval:
+            self.flushRepaint()
+            return
+
+        self.frameTask.connect(self.flushRepaint)
+        self.frameTask.start(max(1, round(self.frameInterval - sinceLastFrame)))
+
+    def flushRepaint(self):
+        self.frameTask.disconnect(self.flushRepaint)
+        self.frameTask.stop()
+
+        self._lastFrame = perf_counter()
+        self.radialMenu.update(self._dirtyRegion)
+        self._dirtyRegion = QtGui.QRegion()
+
+    def prepareRing(self):
+        """Looks up the pens and the pre-drawn centre ring of the menu's theme, once the summon position is final."""
+
+        themeName = self.radialMenu.openPieMenu.get("theme")
+
+        self._themeName = themeName or "default"
+        self._pens = selectionPens(themeName)
+        self._ringPixmap = ringPixmap(themeName, self._inRadius, self.radialMenu.devicePixelRatioF())
+
+        ringCenter = round(self._ringPixmap.width() / self._ringPixmap.devicePixelRatio()) // 2
+        self._ringOrigin = self.radialMenu.summonPos - QtCore.QPoint(ringCenter, ringCenter)
+        self._circleRect = QtCore.QRect(self.radialMenu.summonPos.x() - self._inRadius,
+                                        self.radialMenu.summonPos.y() - self._inRadius,
+                                        self._inRadius * 2, self._inRadius * 2)  # The rect of the center circle
 
     def debugDraw(self, painter: QtGui.QPainter):
         painter.setBrush(transparent)
@@ -558,49 +935,141 @@ class MenuPresenter:
             painter.drawLine(hoverLine)
 
     def paintEvent(self):
+        if self._pens is None:  # Not shown yet, see prepareRing.
+            return
+
+        start = perf_counter()
+
         angle = 1  # TODO: Figure out what this should be.
-        circleRect = QtCore.QRect(self.radialMenu.summonPos.x() - self._inRadius,
-                                  self.radialMenu.summonPos.y() - self._inRadius,
-                                  self._inRadius * 2, self._inRadius * 2)  # The rect of the center circle
         arcSize = 36
-
-        bgCirclePen, fgCirclePen = self.getTheme()
+        circleRect = self._circleRect
+        bgCirclePen, fgCirclePen, linePen = self._pens
 
         painter = QtGui.QPainter(self.radialMenu)
         painter.setRenderHint(QtGui.QPainter.Antialiasing, on=True)
         # highqualityantialising is obsolete value now and is ignored
         # refer to this -> https://doc.qt.io/qtforpython-5/PySide2/QtGui/QPainter.html
 
-        for button in self.radialMenu.buttons:
-            button.setPress(False)
-
         # Draw Background circle
-        painter.setPen(bgCirclePen)
-        painter.drawEllipse(circleRect)
+        painter.drawPixmap(self._ringOrigin, self._ringPixmap)
 
         # Draw Foreground circle
         if angle and not self.checkMouseInCircle():
-            painter.setPen(fgCirclePen)
             if self.radialMenu.globalSettings["useArcOnHover"]:
+                painter.setPen(fgCirclePen)
                 painter.drawArc(circleRect, int(angle - arcSize / 2) * 16, arcSize * 16)
             if self.radialMenu.globalSettings["useLineOnHover"]:
                 # tracking line
-                fgCirclePen.setCapStyle(QtGui.Qt.RoundCap)
-                painter.setPen(fgCirclePen)
+                painter.setPen(linePen)
                 painter.drawLine(self.radialMenu.summonPos, self.radialMenu.currentMousePos)
-                print(self.radialMenu.summonPos, self.radialMenu.currentMousePos)
 
-        self.debugDraw(painter)
+        if self.radialMenu.globalSettings.get("debugDraw"):
+            self.debugDraw(painter)
+
+        painter.end()
+        self.radialMenu.parent().paintTimings[self._themeName].append(perf_counter() - start)
+
+    def selectableButtons(self) -> list:
+        return self.radialMenu.buttons + getButtons(self.radialMenu.selectedButton, True) + getButtons(
+            self._selectedBtnParent)
+
+    def buildSectors(self, parentButton, buttons: list):
+        """Builds the sector table of a group of buttons, from where they are now. Called whenever one is laid out."""
+
+        sectors, innerRadius = [], float("inf")
+        for order, button in enumerate(buttons):
+            offset = button.pos() + getWidgetCenterPos(button) - self.radialMenu.summonPos
+            sectors.append((atan2(offset.y(), offset.x()), order, button))
+            innerRadius = min(innerRadius, hypot(offset.x(), offset.y()))
+
+        sectors.sort(key=lambda sector: sector[:2])
+
+        self._sectorTables[parentButton] = ([sector[0] for sector in sectors], [sector[1:] for sector in sectors],
+                                            innerRadius, {button: order for order, button in enumerate(buttons)})
+
+    def hoverLine(self, button) -> QtCore.QLineF:
+        """The segment between the centre of the button where it is, and where it moves to when hovered."""
+
+        return QtCore.QLineF(button.pos() + getWidgetCenterPos(button),
+                             self.getHoverPosition(button) + getWidgetCenterPos(button))
+
+    def hoverDistance(self, button) -> float:
+        return getTargetingLine(self.hoverLine(button), self.radialMenu.currentMousePos).length()
 
     def findSelectedButton(self):
+        """
+        Same selection as findSelectedButtonExhaustive, but walks out from the cursor's angle (a binary search in the
+        sector table) in each group that can be selected: the pie menu, the submenu of the selected button and the one
+        the selection is in. A side stops as soon as no segment that far around can be closer than the best one so far,
+        which away from the centre is after a sector or two, so the cost doesn't grow with the number of slices. The
+        selected button is always measured, as in a submenu it moves away from its parent button instead.
+        """
+
+        cursor = self.radialMenu.currentMousePos
+        mouseOffset = cursor - self.radialMenu.summonPos
+        cursorAngle = atan2(mouseOffset.y(), mouseOffset.x())
+        cursorDistance = hypot(mouseOffset.x(), mouseOffset.y())
+
+        targetBtn = self.radialMenu.buttons[0]
+        targetBtnDist = QtCore.QLineF(cursor, targetBtn.pos()).length()
+        closest = targetBtnDist  # Of everything measured so far.
+
+        groups = ((None, self.radialMenu.buttons),
+                  (self.radialMenu.selectedButton, getButtons(self.radialMenu.selectedButton, True)),
+                  (self._selectedBtnParent, getButtons(self._selectedBtnParent)))
+
+        selected = self.radialMenu.selectedButton
+        candidates = []  # (group, order in the group, distance, button), to break ties like selectableButtons' order.
+        for group, (parentButton, buttons) in enumerate(groups):
+            if not buttons:
+                continue
+
+            if parentButton not in self._sectorTables:
+                self.buildSectors(parentButton, buttons)
+            angles, sectors, innerRadius, orders = self._sectorTables[parentButton]
+
+            def angleTo(sector: int) -> float:
+                return abs((angles[sector % len(angles)] - cursorAngle + pi) % tau - pi)
+
+            if selected in orders:
+                candidates.append((group, orders[selected], self.hoverDistance(selected), selected))
+                closest = min(closest, candidates[-1][2])
+
+            left, right = (index := bisect(angles, cursorAngle)) - 1, index
+            while right - left <= len(sectors):
+                if angleTo(right) <= angleTo(left):
+                    sector, right = right, right + 1
+                else:
+                    sector, left = left, left - 1
+
+                # Closest a segment at that angle can be: one on the ray from the nearest button outwards.
+                along, across = cursorDistance * cos(angleTo(sector)), cursorDistance * sin(angleTo(sector))
+                if (across if along >= innerRadius else hypot(along - innerRadius, across)) > closest + SECTOR_SLACK:
+                    break
+
+                order, button = sectors[sector % len(sectors)]
+                if button is selected:
+                    continue
+
+                buttonDist = self.hoverDistance(button)
+                candidates.append((group, order, buttonDist, button))
+                closest = min(closest, buttonDist)
+
+        for group, order, buttonDist, button in sorted(candidates, key=lambda candidate: candidate[:2]):
+            if buttonDist < targetBtnDist:
+                targetBtn = button
+                targetBtnDist = buttonDist
+
+        return targetBtn
+
+    def findSelectedButtonExhaustive(self):
+        """Measures the distance to the hover segment of every button. Kept to verify the sector table against."""
+
         targetBtn = self.radialMenu.buttons[0]
         targetBtnDist = QtCore.QLineF(self.radialMenu.currentMousePos, targetBtn.pos()).length()
 
-        for button in self.radialMenu.buttons + getButtons(self.radialMenu.selectedButton, True) + getButtons(
-                self._selectedBtnParent):
-            buttonHoverLine = QtCore.QLineF(button.pos() + getWidgetCenterPos(button),
-                                            self.getHoverPosition(button) + getWidgetCenterPos(button))
-            buttonDist = getTargetingLine(buttonHoverLine, self.radialMenu.currentMousePos).length()
+        for button in self.selectableButtons():
+            buttonDist = self.hoverDistance(button)
 
             if buttonDist < targetBtnDist:
                 targetBtn = button
@@ -615,9 +1084,23 @@ class IOHandler:
 
         self.mousePressed = False
 
-        self.globalMouseTimer = QtCore.QTimer()
-        self.globalMouseTimer.timeout.connect(self.globalMouseMoveEvent)
-        self.globalMouseTimer.start(5)
+        # Shared by all menus, only runs while this menu is the open one, and only if the input hook doesn't report
+        # mouse moves (see Window.llMouseMoveEvent).
+        self.globalMouseTimer = scheduler.task("globalMouse", 5)
+
+    def start(self):
+        self.mousePressed = False
+
+        if self.radialMenu.parent().hookedCursor:
+            return
+
+        self.globalMouseTimer.condition = lambda: self.radialMenu.parent().menu is self.radialMenu
+        self.globalMouseTimer.connect(self.globalMouseMoveEvent)
+        self.globalMouseTimer.start()
+
+    def stop(self):
+        self.globalMouseTimer.disconnect(self.globalMouseMoveEvent)
+        self.globalMouseTimer.stop()
 
     def globalMouseMoveEvent(self):
         last_pos = self.radialMenu.currentMousePos
@@ -627,7 +1110,7 @@ class IOHandler:
             return
 
         self.radialMenu.menuPresenter.updateSelectedButton(self.radialMenu.menuPresenter.findSelectedButton())
-        self.radialMenu.update()
+        self.radialMenu.menuPresenter.cursorMoved()
 
     # Keep the following enabled, although no mouse events will happen
     # as there is not any window shown, but just in case, if something fails,
@@ -646,6 +1129,12 @@ class IOHandler:
         self.radialMenu.menuPresenter.kill()
 
     def llWheelEvent(self, event):
+        selected = self.radialMenu.selectedButton
+        if not (selected and (selected.slice.get("w_up") or selected.slice.get("w_down"))):
+            # Scroll up(7864320), away from the user, goes back a page.
+            if self.radialMenu.turnPage(-1 if event.scan_code == 7864320 else 1):
+                return
+
         for button in self.radialMenu.buttons:
             if button.isHovered:
                 if button.slice.get("w_up") or button.slice.get("w_down"):
@@ -672,6 +1161,7 @@ class RadialMenu(QtWidgets.QWidget):
 
         self.openPieMenu = openPieMenu
         self.globalSettings = globalSettings
+        self.pooled = False  # Set by the MenuPool if this menu is kept around after closing.
 
         self.menuBuilder = MenuBuilder(self)
         self.menuPresenter = MenuPresenter(self)
@@ -679,6 +1169,21 @@ class RadialMenu(QtWidgets.QWidget):
         self.buttons = self.menuBuilder.buildMenu()
         self.selectedButton = None
 
+        # Typed filter and page of the scripted menus, see typeFilter() and turnPage().
+        self.filterQuery = ""
+        self.statusLabel = QtWidgets.QLabel(self)
+        self.statusLabel.hide()
+
+        style = buttonStyle(openPieMenu.get("theme"))
+        palette = self.statusLabel.palette()
+        palette.setColor(QtGui.QPalette.WindowText, style.state(False, False).textColor)
+        if style.state(False, False).backgroundColor:
+            palette.setColor(QtGui.QPalette.Window, style.state(False, False).backgroundColor)
+            self.statusLabel.setAutoFillBackground(True)
+        self.statusLabel.setPalette(palette)
+        self.statusLabel.setFont(style.font)
+        self.statusLabel.setMargin(4)
+
         self.ioHandler = IOHandler(self)
 
         self.setMouseTracking(True)
@@ -686,21 +1191,195 @@ class RadialMenu(QtWidgets.QWidget):
 
     def kill(self):
         self.menuPresenter.animGroup.setDirection(QtCore.QAbstractAnimation.Backward)
-        self.menuPresenter.animGroup.finished.connect(self.hide)
         self.menuPresenter.animGroup.start()
 
         self.parent().menu = None
+        self.ioHandler.stop()
+        self.menuPresenter.resetRepaint()
+        self.menuPresenter.hoverIntent.cancel()
+
+        for request in self.menuBuilder.scriptedRequests:
+            request.cancel()
+
+    def paintEvent(self, event):
+        self.menuPresenter.paintEvent()
+
+    def animationFinished(self):
+        if self.menuPresenter.animGroup.direction() == QtCore.QAbstractAnimation.Forward:
+            QtCore.QTimer.singleShot(0, self.buildIdleSubMenu)
+            return
+
+        self.hide()
+
+        if not self.pooled:
+            self.dispose()
+
+    def updateScriptedButtons(self, group: int, menuOptions: list[dict] | None, final: bool = True):
+        """
+        Shows the fresh results of a scripted menu's script, while the menu is open. If the script failed, the last
+        results are kept, and only the loading placeholder is replaced. Partial results of a streaming script replace
+        the loading placeholder as they come in. Stale results are kept until the script is done.
+        """
 
+        if self.parent().menu is not self:
+            return
+
+        scripted = self.menuBuilder.scriptedGroups[group]
+
+        if menuOptions is None:
+            if scripted.options:
+                return
+            scripted.setFailed()
+        elif not final and scripted.options and not scripted.streaming:
+            return
+        else:
+            scripted.setOptions(menuOptions, streaming=not final)
+
+        self.layoutScriptedGroup(scripted)
+
+    def layoutScriptedGroup(self, scripted: ScriptedGroup):
+        """
+        Gives the options the scripted menu should show buttons, and lays out the menu again. Buttons of options that
+        are still shown in the same place are kept, so a streaming script only adds the buttons of its new options.
+        """
+
+        visible = scripted.visibleSlices()
+        oldButtons = scripted.buttons
+
+        kept = 0
+        while kept < min(len(oldButtons), len(visible)) and oldButtons[kept].slice is visible[kept]:
+            kept += 1
+
+        addedButtons = [self.menuBuilder.buildButton(menuOption) for menuOption in visible[kept:]]
+        removedButtons = oldButtons[kept:]
+
+        scripted.buttons = oldButtons[:kept] + addedButtons
+
+        index = self.buttons.index(oldButtons[0])
+        self.buttons[index:index + len(oldButtons)] = scripted.buttons
+
+        self.updateStatusLabel()
+
+        for button in removedButtons:
+            if button.opacityAnim:
+                self.menuPresenter.animGroup.removeAnimation(button.opacityAnim)
+            button.hide()
+            button.deleteLater()
+
+        if not addedButtons and not removedButtons:
+            return
+
+        # The layout changes, so start over with nothing selected.
+        for button in self.buttons:
+            button.setHover(False)
+            if button.subMenu:
+                button.subMenu.hideSubMenu()
+        self.selectedButton = None
+        self.menuPresenter.resetSelection()
+        self.menuPresenter.hoverIntent.cancel()
+
+        for button in addedButtons:
+            button.show()
+        self.menuPresenter.setButtonPositions()
+
+        for button in addedButtons:
+            anims = button.animate(self.summonPos - getWidgetCenterPos(button), button.pos(), False, 70)
+            self.menuPresenter.animGroup.addAnimation(anims[1])
+
+        self.update()
+
+    def pagedGroup(self) -> ScriptedGroup | None:
+        """The scripted menu the wheel pages: the one of the selected button, or else the first with several pages."""
+
+        pagedGroups = [scripted for scripted in self.menuBuilder.scriptedGroups if scripted.pageCount() > 1]
+
+        for scripted in pagedGroups:
+            if self.selectedButton in scripted.buttons:
+                return scripted
+
+        return pagedGroups[0] if pagedGroups else None
+
+    def turnPage(self, step: int) -> bool:
+        scripted = self.pagedGroup()
+        if scripted is None or not scripted.turnPage(step):
+            return False
+
+        self.layoutScriptedGroup(scripted)
+        return True
+
+    def acceptsTyping(self) -> bool:
+        return bool(self.menuBuilder.scriptedGroups)
+
+    def typeFilter(self, character: str):
+        """Adds a typed character to the filter of the scripted menus, or removes the last one on backspace."""
+
+        query = self.filterQuery[:-1] if character == "\b" else self.filterQuery + character
+        if query == self.filterQuery:
+            return
+
+        self.filterQuery = query
+        for scripted in self.menuBuilder.scriptedGroups:
+            scripted.setQuery(query)
+            self.layoutScriptedGroup(scripted)
+
+    def updateStatusLabel(self):
+        """Shows the typed filter and the page of the scripted menus, under the centre of the menu."""
+
+        pages = [f"{scripted.page + 1}/{scripted.pageCount()}" for scripted in self.menuBuilder.scriptedGroups
+                 if scripted.pageCount() > 1]
+        text = "  ".join(([self.filterQuery] if self.filterQuery else []) + pages)
+
+        if not text:
+            self.statusLabel.hide()
+            return
+
+        self.statusLabel.setText(text)
+        self.statusLabel.adjustSize()
+        self.statusLabel.move(self.summonPos.x() - self.statusLabel.width() // 2,
+                              self.summonPos.y() + self.menuPresenter._inRadius + 12)
+        self.statusLabel.show()
+        self.statusLabel.raise_()
+
+    def buildIdleSubMenu(self):
+        """
+        Builds the submenus that weren't opened yet once the menu is shown, one per event loop iteration so input is
+        handled in between. Stops when the menu is closed.
+        """
+
+        if self.parent().menu is not self:
+            return
+
+        for button in self.buttons:
+            if button.subMenu and not button.subMenu.built:
+                button.subMenu.ensureBuilt()
+                QtCore.QTimer.singleShot(0, self.buildIdleSubMenu)
+                return
+
+    def dispose(self):
         for button in self.buttons:
             button.deleteLater()
 
         self.deleteLater()
 
-        del self.menuBuilder
-        del self.menuPresenter
-        del self.ioHandler
+    def rearm(self, summonPosition):
+        """Resets a closed menu from the pool, to be shown again at summonPosition."""
+
+        self.menuPresenter.animGroup.stop()
+
+        self.summonPos = self.parent().mapFromGlobal(summonPosition)
+        self.currentMousePos = QtCore.QPoint(self.summonPos)
+        self.selectedButton = None
+        self.menuPresenter.resetSelection()
+        self.menuPresenter.resetRepaint()
+
+        for button in self.buttons:
+            button.setHover(False)
+            button.setPress(False)
+            button.actuallyHovered = False
+            button.move(0, 0)  # fixSummonPosition guesses the menu's extents from the initial positions.
 
-        del self
+            if button.subMenu:
+                button.subMenu.hideSubMenu()
 
     def show(self):
         super().show()
@@ -708,10 +1387,18 @@ class RadialMenu(QtWidgets.QWidget):
         self.summonPos = self.menuPresenter.fixSummonPosition(self.summonPos)
         self.currentMousePos = QtCore.QPoint(self.summonPos)
         self.menuPresenter.setButtonPositions()
+        self.menuPresenter.prepareRing()
+        self.updateStatusLabel()
 
-        self.menuPresenter.animGroup = QtCore.QParallelAnimationGroup()
-        for button in self.buttons:
-            anims = button.animate(self.summonPos - getWidgetCenterPos(button), button.pos(), False, 70)
-            self.menuPresenter.animGroup.addAnimation(anims[1])
+        if self.menuPresenter.animGroup is None:
+            self.menuPresenter.animGroup = QtCore.QParallelAnimationGroup()
+            self.menuPresenter.animGroup.finished.connect(self.animationFinished)
 
+            for button in self.buttons:
+                anims = button.animate(self.summonPos - getWidgetCenterPos(button), button.pos(), False, 70)
+                self.menuPresenter.animGroup.addAnimation(anims[1])
+
+        self.menuPresenter.animGroup.setDirection(QtCore.QAbstractAnimation.Forward)
         self.menuPresenter.animGroup.start()
+
+        self.ioHandler.start()
@@ -1,22 +1,12 @@
-import core
-from frontend import Window
-from settings.pie_themes import tray_theme
-from settingsMenu import SettingsManager
-from systemTrayIcon import SystemTrayIcon
-
+# The app's modules are only imported when this is run as the main script. The script worker processes (see
+# scriptworkers.py) are spawned, which runs this file again in each of them, and they shouldn't load Qt and the app.
 from functools import partial
+from multiprocessing import freeze_support
 import os
 import sys
 
-from PySide2 import QtGui, QtWidgets, QtCore
-
-
-# allow only single instance of this script to run
-os.environ["PBR_VERSION"] = "4.0.2"  # this removes  tendo/pbr error after pyinstaller compiles it.
-from tendo import singleton
 
-
-def GetAllReferences(app: QtWidgets.QApplication, with_funcs=False):  # TODO: This is really fucking smart. Remember
+def GetAllReferences(app: "QtWidgets.QApplication", with_funcs=False):  # TODO: This is really fucking smart. Remember
     # this for
     # future projects.
     only_vars = {"DEBUGMODE": core.DEBUGMODE,
@@ -71,6 +61,24 @@ def SetHighDPISettings():
 
 
 if __name__ == "__main__":
+    freeze_support()  # Frozen builds start the script workers through this executable too.
+
+    import core
+    from frontend import Window
+    from iconatlas import prepareIcons
+    from scriptedmenus import scriptedMenuProvider
+    from scriptworkers import scriptRunner
+    from settings.pie_themes import tray_theme
+    from settingsMenu import SettingsManager
+    from systemTrayIcon import SystemTrayIcon
+    from windowhook import ForegroundWatcher
+
+    from PySide2 import QtGui, QtWidgets, QtCore
+
+    # allow only single instance of this script to run
+    os.environ["PBR_VERSION"] = "4.0.2"  # this removes  tendo/pbr error after pyinstaller compiles it.
+    from tendo import singleton
+
     _ = singleton.SingleInstance()
 
     if len(sys.argv) > 1:
@@ -90,14 +98,27 @@ if __name__ == "__main__":
 
     CreateTrayWidget(app, settingsManager)
 
+    # Fill the icon cache before the first pie menu is opened, from the atlas on disk when it's up to date. Icons that
+    # aren't in it are rendered in the background.
+    iconAtlas = prepareIcons(app, settingsManager.appProfiles)
+
+    # Menu scripts and runScript run in worker processes, started now so the first script doesn't wait for one.
+    scriptedMenuProvider.debug = core.DEBUGMODE
+    for workerPool in (scriptedMenuProvider.workers, scriptRunner):
+        workerPool.start()
+        app.aboutToQuit.connect(workerPool.shutdown)
+
     window = Window()
     window.showFullScreen()
 
     activeProfile = core.ActiveProfile(settingsManager, window, CreateMonitorManager())
 
-    timerWinChange = QtCore.QTimer()
-    timerWinChange.timeout.connect(partial(core.detectWindowChange, activeProfile))
-
-    timerWinChange.start(core.WINCHANGE_latency)
+    # Foreground changes are pushed by a WinEvent hook; WINCHANGE_latency is only used if polling is needed instead.
+    windowWatcher = ForegroundWatcher(pollInterval=core.WINCHANGE_latency)
+    windowWatcher.foregroundChanged.connect(partial(core.detectWindowChange, activeProfile))
+    windowWatcher.windowDestroyed.connect(activeProfile.profileCache.invalidate)
+    windowWatcher.foregroundChanged.connect(core.windowTitleIndex.invalidate)
+    windowWatcher.start()
+    activeProfile.profileCache.setEnabled(not windowWatcher.usingFallback)
 
     sys.exit(app.exec_())
@@ -0,0 +1,225 @@
+# On-disk atlas of the rendered pie menu icons.
+# At startup every icon the profiles refer to is rendered in every colour of the themes, at the pixel ratio of every
+# screen, and put in the icon cache, so the first pie menu that's opened doesn't have to parse any SVGs. The renders
+# are packed into a single image in resources/cache/, with an index that records the mtime and hash of each source
+# icon, so later runs only load that image and render just the icons that were added or changed. Those are rendered in
+# the background, and put in the cache as they come in, so a cold start doesn't wait for them.
+from iconcache import iconCache, icons_dir, rasterize, script_dir
+from settings.pie_themes import pie_selection_theme
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+
+from PySide2 import QtGui, QtCore, QtWidgets
+
+
+ATLAS_VERSION = 2
+ATLAS_WIDTH = 2048
+cache_dir = os.path.join(script_dir, "resources/cache/")
+atlas_image = os.path.join(cache_dir, "iconAtlas.png")
+atlas_index = os.path.join(cache_dir, "iconAtlas.json")
+
+
+def profileIconNames(appProfiles: list) -> set[str]:
+    """Returns the names of the icons used by the slices and subslices of all profiles."""
+
+    names = set()
+    for profile in appProfiles:
+        for pieMenu in profile.get("piemenus", []):
+            for pieSlice in pieMenu.get("slices", []):
+                for item in (pieSlice, *pieSlice.get("subslices", [])):
+                    if item.get("icon"):
+                        names.add(item["icon"].strip())
+
+    return names
+
+
+def themeColors() -> list[str]:
+    colors = set()
+    for theme in pie_selection_theme.values():
+        if theme.get("svg_nohover_hover"):
+            colors.update(theme["svg_nohover_hover"].strip().split("_"))
+
+    return sorted(colors)
+
+
+def atlasName(path: str) -> str:
+    """The icon's path relative to icons_dir, with forward slashes, so the index reads the same on every platform."""
+
+    return os.path.relpath(path, icons_dir).replace(os.sep, "/")
+
+
+def sourceStamp(path: str) -> dict:
+    with open(path, "rb") as file:
+        digest = hashlib.sha1(file.read()).hexdigest()
+
+    return {"mtime": os.path.getmtime(path), "sha1": digest}
+
+
+def sourceUnchanged(path: str, stamp: dict) -> bool:
+    """Compares the mtime first, and only hashes the file if that differs (e.g. after a checkout)."""
+
+    if not os.path.exists(path):
+        return False
+    if os.path.getmtime(path) == stamp.get("mtime"):
+        return True
+
+    return sourceStamp(path)["sha1"] == stamp.get("sha1")
+
+
+class IconAtlas(QtCore.QObject):
+    _rendered = QtCore.Signal(object, object)
+
+    def __init__(self, iconSize: QtCore.QSize, devicePixelRatios: list[float]):
+        super().__init__()
+
+        self.iconSize = iconSize
+        self.devicePixelRatios = sorted(set(devicePixelRatios))
+
+        self.images: dict[tuple[str, str | None, float], QtGui.QImage] = {}  # (icon path, colour, dpr) -> render
+        self.loaded = 0
+        self.rendered = 0
+        self.pending = 0  # Renders still running in the background.
+
+        # Renders are made on worker threads, and put in the icon cache on the GUI thread.
+        self._rendered.connect(self._deliver, QtCore.Qt.QueuedConnection)
+
+    def requiredKeys(self, iconNames: set[str]) -> list[tuple[str, str | None, float]]:
+        """The (icon path, colour, dpr) of every icon a Button can ask the cache for, see Button.findIcon."""
+
+        colors = themeColors()
+
+        keys = set()
+        for name in iconNames:
+            path = iconCache.resolvePath(name)
+            for dpr in self.devicePixelRatios:
+                keys.add((path, None, dpr))
+                if name.endswith(".svg"):
+                    keys.update((path, color, dpr) for color in colors)
+
+        return sorted(keys, key=lambda key: (key[0], key[1] or "", key[2]))
+
+    def load(self, keys: list):
+        """Takes the renders of the keys from the atlas on disk, skipping any whose source icon changed since."""
+
+        try:
+            with open(atlas_index) as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+
+        if index.get("version") != ATLAS_VERSION or index.get("iconSize") != [self.iconSize.width(),
+                                                                              self.iconSize.height()]:
+            return
+
+        image = QtGui.QImage(atlas_image)
+        if image.isNull():
+            return
+
+        # Matched by name, as the paths of the keys are however the profiles spelled them (see IconCache.resolvePath).
+        wanted = {(atlasName(key[0]), key[1], key[2]): key for key in keys}
+        unchanged = {name: sourceUnchanged(os.path.join(icons_dir, name), stamp)
+                     for name, stamp in index.get("sources", {}).items()}
+
+        for entry in index.get("entries", []):
+            key = wanted.get((entry["icon"], entry["color"], entry["dpr"]))
+            if key and unchanged.get(entry["icon"]):
+                self.images[key] = image.copy(*entry["rect"])
+                self.loaded += 1
+
+    def render(self, keys: list):
+        """
+        Renders the keys that weren't in the atlas on a pool of worker threads, without waiting for them. Each render
+        is put in the icon cache as it comes in, and the atlas is saved once the last one is in.
+        """
+
+        self.pending += len(keys)
+
+        pool = ThreadPoolExecutor(thread_name_prefix="IconAtlas")
+        for key in keys:
+            pool.submit(self._renderKey, key)
+        pool.shutdown(wait=False)
+
+    def _renderKey(self, key: tuple):
+        path, color, dpr = key
+        self._rendered.emit(key, rasterize(path, color, self.iconSize * dpr))
+
+    @QtCore.Slot(object, object)
+    def _deliver(self, key: tuple, image: QtGui.QImage):
+        path, color, dpr = key
+
+        self.images[key] = image
+        self.rendered += 1
+        iconCache.seed(path, color, self.iconSize, dpr, image)
+
+        self.pending -= 1
+        if not self.pending:
+            self.save()
+
+    def save(self):
+        """Packs all renders into shelves (rows) of a single image, and writes it next to its index."""
+
+        entries, rects = [], []
+        x = y = shelfHeight = 0
+        for key, image in sorted(self.images.items(), key=lambda item: -item[1].height()):
+            if x + image.width() > ATLAS_WIDTH:
+                x, y, shelfHeight = 0, y + shelfHeight, 0
+
+            rects.append((x, y, image))
+            entries.append({"icon": atlasName(key[0]), "color": key[1], "dpr": key[2],
+                            "rect": [x, y, image.width(), image.height()]})
+
+            x += image.width()
+            shelfHeight = max(shelfHeight, image.height())
+
+        atlas = QtGui.QImage(ATLAS_WIDTH, max(1, y + shelfHeight), QtGui.QImage.Format_ARGB32_Premultiplied)
+        atlas.fill(QtCore.Qt.transparent)
+
+        painter = QtGui.QPainter(atlas)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        for x, y, image in rects:
+            painter.drawImage(x, y, image)
+        painter.end()
+
+        sources = {entry["icon"] for entry in entries}
+        index = {"version": ATLAS_VERSION,
+                 "iconSize": [self.iconSize.width(), self.iconSize.height()],
+                 "sources": {name: sourceStamp(os.path.join(icons_dir, name)) for name in sorted(sources)},
+                 "entries": entries}
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            if not atlas.save(atlas_image, "PNG"):
+                raise OSError(f"Could not write {atlas_image}")
+            with open(atlas_index, "w") as file:
+                json.dump(index, file)
+        except OSError as e:
+            print(f"Could not save the icon atlas: {e}")
+
+    def seedCache(self):
+        for (path, color, dpr), image in self.images.items():
+            iconCache.seed(path, color, self.iconSize, dpr, image)
+
+
+def prepareIcons(app: QtWidgets.QApplication, appProfiles: list) -> IconAtlas:
+    """
+    Startup stage, to be run once the QApplication exists. Fills the icon cache from the atlas on disk, and renders
+    what's missing from it in the background, writing the atlas back once that's done. The atlas has to be kept
+    referenced until then.
+    """
+
+    iconSize = QtCore.QSize(*[app.style().pixelMetric(QtWidgets.QStyle.PM_ButtonIconSize)] * 2)  # QPushButton's.
+    atlas = IconAtlas(iconSize, [screen.devicePixelRatio() for screen in app.screens()])
+
+    keys = atlas.requiredKeys(profileIconNames(appProfiles))
+    atlas.load(keys)
+
+    atlas.seedCache()
+
+    missing = [key for key in keys if key not in atlas.images]
+    if missing:
+        atlas.render(missing)
+
+    return atlas
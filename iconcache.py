@@ -0,0 +1,119 @@
+# Process-wide cache of rendered icons.
+# Buttons used to parse and recolour their SVGs every time they were built. Rendered icons are now kept per
+# (icon path, colour, size, device pixel ratio), up to a memory cap, with the least recently used ones dropped first.
+from collections import OrderedDict
+import os
+
+from PySide2 import QtGui, QtCore, QtSvg
+
+
+script_dir = os.path.dirname(__file__)
+icons_dir = os.path.join(script_dir, "resources/icons/")
+default_icon = os.path.join(icons_dir, "default.svg")
+
+
+def rasterize(path: str, color: str | None, pixelSize: QtCore.QSize) -> QtGui.QImage:
+    """
+    Renders the icon into an image of pixelSize, in the given colour if set. Only uses QImage and QPainter, so it can
+    be run off the GUI thread (see iconatlas.py).
+    """
+
+    if not path.endswith(".svg"):
+        image = QtGui.QImage(path)
+        if image.width() > pixelSize.width() or image.height() > pixelSize.height():  # Icons are never scaled up.
+            image = image.scaled(pixelSize, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        return image.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+
+    image = QtGui.QImage(pixelSize, QtGui.QImage.Format_ARGB32_Premultiplied)
+    image.fill(QtCore.Qt.transparent)
+
+    renderer = QtSvg.QSvgRenderer(path)
+    renderer.setAspectRatioMode(QtCore.Qt.KeepAspectRatio)
+
+    painter = QtGui.QPainter(image)
+    renderer.render(painter)
+
+    if color:  # Keep the shape of the icon, but paint all of it in the colour.
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceIn)
+        painter.fillRect(image.rect(), QtGui.QColor(color))
+
+    painter.end()
+
+    return image
+
+
+class IconCache:
+    def __init__(self, maxBytes: int = 16 * 1024 * 1024):
+        self.maxBytes = maxBytes
+        self.totalBytes = 0
+
+        self.entries: OrderedDict[tuple, tuple[QtGui.QIcon, int]] = OrderedDict()  # key -> (icon, size in bytes)
+        self.resolvedPaths: dict[str, str] = {}  # Icon name from the profile -> existing file, or the default icon.
+
+        self.hits = 0
+        self.misses = 0
+        self.seeded = 0  # Entries put in by the icon atlas at startup.
+
+    def resolvePath(self, iconName: str) -> str:
+        """Returns the path of the icon, falling back to default.svg if it doesn't exist. Checked once per name."""
+
+        if iconName not in self.resolvedPaths:
+            path = os.path.join(icons_dir, iconName)
+            self.resolvedPaths[iconName] = path if os.path.exists(path) else default_icon
+
+        return self.resolvedPaths[iconName]
+
+    def icon(self, path: str, color: str | None, size: QtCore.QSize, devicePixelRatio: float) -> QtGui.QIcon:
+        """Returns the icon rendered at size, in the given colour if it's an SVG that should be recoloured."""
+
+        key = (path, color, size.width(), size.height(), devicePixelRatio)
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+        self.misses += 1
+
+        pixmap = self.render(path, color, size, devicePixelRatio)
+        self.insert(key, pixmap)
+
+        return self.entries[key][0]
+
+    @staticmethod
+    def render(path: str, color: str | None, size: QtCore.QSize, devicePixelRatio: float) -> QtGui.QPixmap:
+        pixmap = QtGui.QPixmap.fromImage(rasterize(path, color, size * devicePixelRatio))
+        pixmap.setDevicePixelRatio(devicePixelRatio)
+
+        return pixmap
+
+    def seed(self, path: str, color: str | None, size: QtCore.QSize, devicePixelRatio: float, image: QtGui.QImage):
+        """Puts an icon that was rendered beforehand in the cache, under the same key icon() looks it up with."""
+
+        pixmap = QtGui.QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(devicePixelRatio)
+
+        self.insert((path, color, size.width(), size.height(), devicePixelRatio), pixmap)
+        self.seeded += 1
+
+    def insert(self, key: tuple, pixmap: QtGui.QPixmap):
+        if key in self.entries:
+            self.totalBytes -= self.entries.pop(key)[1]
+
+        size = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        self.entries[key] = (QtGui.QIcon(pixmap), size)
+        self.totalBytes += size
+
+        while self.totalBytes > self.maxBytes and len(self.entries) > 1:
+            self.totalBytes -= self.entries.popitem(last=False)[1][1]
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self.entries),
+                "bytes": self.totalBytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "seeded": self.seeded}
+
+
+iconCache = IconCache()
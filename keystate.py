@@ -0,0 +1,97 @@
+# Keeps track of which keys are held down, fed by the key up/down events of the keyboard library's hook. It's fed
+# from a blocking hook of the library, which is called for every key before the hotkeys, so it also sees the keys
+# that suppressed hotkeys keep from the other hooks, whichever hook Windows calls first.
+# Answering "is this hotkey held" is then a couple of set lookups on pre-parsed scan codes, instead of keyboard.is_pressed
+# parsing the hotkey string and taking the library's lock on every call. Release callbacks fire as soon as the key
+# goes up, so nothing has to poll for it.
+from threading import Lock
+
+import keyboard
+from PySide2 import QtCore
+
+
+class KeyStateTracker(QtCore.QObject):
+    _released = QtCore.Signal(object)
+
+    def __init__(self):
+        super().__init__()
+
+        self.pressed: set[int] = set()  # Scan codes.
+
+        self._parsedHotkeys: dict[str, tuple[frozenset[int], ...]] = {}
+        self._releaseWatchers: list[tuple[tuple[frozenset[int], ...], object]] = []
+        self._watchersLock = Lock()
+
+        # Key events come in on the keyboard library's hook thread, release callbacks are run on the GUI thread.
+        self._released.connect(self._runCallback, QtCore.Qt.QueuedConnection)
+
+    def install(self):
+        """Starts tracking. keyboard.unhook_all removes the hook, so it has to be installed again after that."""
+
+        self.pressed.clear()
+        keyboard.hook(self._onKeyEvent, suppress=True)
+
+    def _onKeyEvent(self, event) -> bool:
+        self.feed(event.scan_code, event.event_type == keyboard.KEY_DOWN)
+        return True  # Never blocks the key.
+
+    def parse(self, hotkey: str) -> tuple[frozenset[int], ...]:
+        """
+        Returns the keys of the (last step of the) hotkey, each key being the set of scan codes that can produce it.
+        E.g. 'ctrl+a' -> (frozenset({29, 3613}), frozenset({30})).
+        """
+
+        if hotkey not in self._parsedHotkeys:
+            steps = keyboard.parse_hotkey(hotkey)
+            self._parsedHotkeys[hotkey] = tuple(frozenset(scanCodes) for scanCodes in steps[-1])
+
+        return self._parsedHotkeys[hotkey]
+
+    def isHeld(self, hotkey: str) -> bool:
+        if not hotkey:
+            return False
+
+        return self._keysHeld(self.parse(hotkey))
+
+    def _keysHeld(self, keys) -> bool:
+        return all(not self.pressed.isdisjoint(scanCodes) for scanCodes in keys)
+
+    def onRelease(self, hotkey: str, callback):
+        """Calls callback on the GUI thread once the hotkey is no longer held. Right away if it isn't held now."""
+
+        keys = self.parse(hotkey)
+
+        with self._watchersLock:
+            if self._keysHeld(keys):
+                self._releaseWatchers.append((keys, callback))
+                return
+
+        callback()
+
+    def cancelRelease(self, callback):
+        with self._watchersLock:
+            self._releaseWatchers = [watcher for watcher in self._releaseWatchers if watcher[1] != callback]
+
+    def feed(self, scanCode: int, isDown: bool):
+        """Called from the keyboard library's hook thread on every key up/down event."""
+
+        if isDown:
+            self.pressed.add(scanCode)
+            return
+
+        # Under the lock, so a watcher onRelease is adding either sees the key go up or is seen here.
+        with self._watchersLock:
+            self.pressed.discard(scanCode)
+
+            released = [watcher for watcher in self._releaseWatchers if not self._keysHeld(watcher[0])]
+            if not released:
+                return
+
+            self._releaseWatchers = [watcher for watcher in self._releaseWatchers if watcher not in released]
+
+        for keys, callback in released:
+            self._released.emit(callback)
+
+    @QtCore.Slot(object)
+    def _runCallback(self, callback):
+        callback()
@@ -2,15 +2,18 @@
 # here:http://stackoverflow.com/questions/9817531/applying-low-level-keyboard-hooks-with-python-and-setwindowshookexa
 import ctypes
 import win32con
-from collections import namedtuple
-from ctypes import wintypes, windll, CFUNCTYPE, POINTER, c_int, c_void_p, byref
+from collections import deque, namedtuple
+from ctypes import wintypes, windll, CFUNCTYPE, POINTER, c_int, c_ulong, c_void_p, byref
 import atexit
+from threading import Thread
 
 
 KeyEvents = namedtuple("KeyEvents", (['event_type', 'key_code',
                                       'scan_code', 'alt_pressed',
                                       'time']))
-mouseHandlers = []
+mouseHandlers = []  # Called on the GUI thread with each KeyEvents, see InputThread.drain().
+moveHandlers = []  # Called on the GUI thread, at most once per drain, if the mouse moved since the last one.
+typeHandlers = []  # Called on the GUI thread with each character typed while typing is enabled ('\b' for backspace).
 
 MOUSE_CODES = {512: 'mouse move',  # WM_MouseMove
                513: 'LButton Down',
@@ -20,74 +23,252 @@ MOUSE_CODES = {512: 'mouse move',  # WM_MouseMove
                522: 'wheel',
                0x0215: 'WM_CAPTURECHANGED'}
 
+WM_QUIT = 0x0012
+WM_KEYDOWN = 0x0100
+WM_SYSKEYDOWN = 0x0104
+WM_MOUSEMOVE = 0x0200
+WM_HOOK_KEYBOARD = 0x8000  # WM_APP. Posted to the input thread to install (wParam 1) or remove its keyboard hook.
+LLKHF_ALTDOWN = 0x20
+CTRL_SCAN_CODE = 29
+WIN_SCAN_CODES = (91, 92)  # Left and right Windows key.
+
+# Virtual key codes that can be typed into a menu, and the characters they stand for.
+TYPED_KEYS = {**{vk: chr(vk).lower() for vk in (*range(0x30, 0x3A), *range(0x41, 0x5B), 0x20)}, 0x08: "\b"}
+KEY_NAME_CHARACTERS = {"space": " ", "backspace": "\b"}  # Keyboard library names of the TYPED_KEYS that aren't chars.
+
+# What the hook does with each mouse message, looked up before anything else is done with it.
+IGNORE, BUFFER, COALESCE = 0, 1, 2
+MESSAGE_ACTIONS = {wParam: COALESCE if wParam == WM_MOUSEMOVE else BUFFER for wParam in MOUSE_CODES}
+
+
+def typedKeyCodes(hotkeys) -> set[int]:
+    """The virtual key codes of the TYPED_KEYS that the keyboard library hotkeys end on, e.g. 'a' or 'shift+1'."""
+
+    codes = set()
+    for hotkey in hotkeys:
+        name = hotkey.split("+")[-1].strip().lower()
+        character = KEY_NAME_CHARACTERS.get(name, name)
+        codes.update(vk for vk, typed in TYPED_KEYS.items() if typed == character)
+
+    return codes
+
+
+class InputThread(Thread):
+    """
+    A single long-lived thread that owns the low level mouse and keyboard hooks, and runs the message pump they need.
 
-def listener():
-    """The listener listens to events and adds them to mouseHandlers."""
+    Mouse events are only looked at while mouseEnabled is set - a plain flag the GUI flips when a menu opens or closes.
+    Button and wheel events are put in a bounded ring buffer as plain tuples, and wake() is called (at most once until
+    the next drain) so the GUI thread can drain() them. Moves aren't buffered, only the latest position is kept, and
+    they wake the GUI the same way, so any number of moves between two drains is handled once.
+    Mouse events are never swallowed, they always go on to the app underneath as well.
+    The keyboard hook is only installed while typingEnabled is set, so it always comes after the keyboard library's
+    (a hotkey opened the menu) and Windows calls it first. Key presses of letters, digits, space and backspace are
+    then swallowed and buffered like mouse events, so they can be typed into the open menu instead of the app
+    underneath. Keys that were already held, keys with ctrl, alt or the Windows key held, and the keys passed to
+    setTypingEnabled (the menu's trigger keys) are left alone. Which keys are held comes from heldKeys, the scan codes the keyboard library's hook
+    saw go down (see KeyStateTracker), as keys can be held from before this hook was installed.
+    """
 
-    def low_level_handler(nCode, wParam, lParam):
+    def __init__(self, wake=None, mouseHooked=None, heldKeys: set[int] = frozenset(), bufferSize: int = 256):
+        super().__init__(name="InputHooks", daemon=True)
+
+        self.wake = wake
+        self.mouseHooked = mouseHooked  # Called from this thread once the mouse hook is installed.
+
+        self.mouseEnabled = False
+
+        self.typingEnabled = False
+        self.typedFlags = bytearray(0x100)  # Indexed by virtual key code, 1 for the TYPED_KEYS.
+        for vk in TYPED_KEYS:
+            self.typedFlags[vk] = 1
+        self.heldKeys = heldKeys
+        self._swallowedKeys: set[int] = set()  # Virtual key codes of which the repeats and release are swallowed too.
+
+        self.events = deque(maxlen=bufferSize)
+        self._wakePending = False
+
+        self.lastMove = None  # The latest position of the 'mouse move' events, as packed by the hook (y << 32 | x).
+        self.moveCount = 0  # Only written by the hook, so drain() can tell whether there were moves since the last one.
+        self._drainedMoveCount = 0
+
+        self._mouseHookId = None
+        self._keyboardHookId = None
+        self._keyboardPointer = None
+        self.callNextHook = None  # windll.user32.CallNextHookEx, set once the thread runs.
+
+    def lowLevelHandler(self, nCode, wParam, lParam):
         """
-        Processes a low level Windows mouse event.
+        Processes a low level Windows mouse event. This is called for every mouse event in the system while the OS
+        waits, so everything that isn't of interest is passed on before anything else happens.
         """
-        event = KeyEvents(MOUSE_CODES[wParam], lParam[0], lParam[1], lParam[2] == 32, lParam[3])
 
-        if MOUSE_CODES.get(wParam):
-            returnval = None
-            for handle in mouseHandlers:
-                # return value from last handler will be used, obviously.
-                returnval = handle(event)
+        if not self.mouseEnabled or nCode < 0:
+            return self.callNextHook(self._mouseHookId, nCode, wParam, lParam)
 
-            if returnval == -1:
-                if returnval == "pass_event":
-                    return windll.user32.CallNextHookEx(hook_id, nCode, wParam, lParam)
+        action = MESSAGE_ACTIONS.get(wParam, IGNORE)
+
+        if action == COALESCE:
+            self.lastMove = lParam[0]
+            self.moveCount += 1
+
+            if not self._wakePending and self.wake:
+                self._wakePending = True
+                self.wake()
+        elif action == BUFFER:
+            self.push((wParam, lParam[0], lParam[1], lParam[2], lParam[3]))
 
         # Be nice, return next hook
-        return windll.user32.CallNextHookEx(hook_id, nCode, wParam, lParam)
-
-    # Our low level handler signature.
-    CMPFUNC = CFUNCTYPE(c_int, c_int, c_int, POINTER(c_void_p))
-    # Convert the Python handler into C pointer.
-    pointer = CMPFUNC(low_level_handler)
-    # Added 4-18-15 for move to ctypes:
-    windll.kernel32.GetModuleHandleW.restype = wintypes.HMODULE
-    windll.kernel32.GetModuleHandleW.argtypes = [wintypes.LPCWSTR]
-    # Hook both key up and key down events for common keys (non-system).
-    windll.user32.SetWindowsHookExA.argtypes = (c_int, wintypes.HANDLE, wintypes.HMODULE, wintypes.DWORD)
-    hook_id = windll.user32.SetWindowsHookExA(win32con.WH_MOUSE_LL, pointer, windll.kernel32.GetModuleHandleW(None), 0)
-    global HOOK_ID
-    HOOK_ID = hook_id
-
-    # Register to remove the hook when the interpreter exits.
-    atexit.register(windll.user32.UnhookWindowsHookEx, hook_id)
-    try:
-        print(windll.user32.GetMessageW(None, 0, 0, 0))
-        msg = windll.user32.GetMessageW(None, 0, 0, 0)
-        windll.user32.TranslateMessage(byref(msg))
-        windll.user32.DispatchMessageW(byref(msg))
-    except Exception as e:
-        pass
-        """print(e)
-        if hasattr(e, 'message'):
-            print(e.message)
-        print("Exception raised in mouse hook thread (maybe WM_QUIT)")"""
+        return self.callNextHook(self._mouseHookId, nCode, wParam, lParam)
 
+    def typedKey(self, vk: int, scanCode: int, isDown: bool, flags: int) -> bool:
+        """Buffers a key typed into the menu. Returns whether the key event should be swallowed."""
 
-def print_event(e):
-    print(e)
-    wParam = e[0]
-    # pass
+        if vk in self._swallowedKeys:  # A repeat or the release of a key that was typed.
+            if not isDown:
+                self._swallowedKeys.discard(vk)
+            return True
 
+        if not isDown or vk > 0xFF or not self.typedFlags[vk] or flags & LLKHF_ALTDOWN or scanCode in self.heldKeys \
+                or CTRL_SCAN_CODE in self.heldKeys or any(winKey in self.heldKeys for winKey in WIN_SCAN_CODES):
+            return False
 
-# mouseHandlers.append(print_event)
+        self._swallowedKeys.add(vk)
+        self.push((WM_KEYDOWN, vk, 0, 0, 0))
+        return True
 
-WM_QUIT = 0x0012
-HOOK_ID = None
+    def run(self):
+        # Our low level handler signatures.
+        MOUSEPROC = CFUNCTYPE(c_int, c_int, c_int, POINTER(c_void_p))
+        KEYBOARDPROC = CFUNCTYPE(c_int, c_int, c_int, POINTER(c_ulong))
+
+        def keyboardHandler(nCode, wParam, lParam):
+            """Processes a low level Windows keyboard event. lParam points to a KBDLLHOOKSTRUCT."""
+
+            if nCode >= 0 and self.typingEnabled \
+                    and self.typedKey(lParam[0], lParam[1], wParam in (WM_KEYDOWN, WM_SYSKEYDOWN), lParam[2]):
+                return 1
+
+            return self.callNextHook(self._keyboardHookId, nCode, wParam, lParam)
+
+        self.callNextHook = windll.user32.CallNextHookEx
+
+        # Convert the Python handlers into C pointers, referenced for as long as the thread runs.
+        mousePointer = MOUSEPROC(self.lowLevelHandler)
+        self._keyboardPointer = KEYBOARDPROC(keyboardHandler)
+
+        # Added 4-18-15 for move to ctypes:
+        windll.kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+        windll.kernel32.GetModuleHandleW.argtypes = [wintypes.LPCWSTR]
+        windll.user32.SetWindowsHookExA.argtypes = (c_int, wintypes.HANDLE, wintypes.HMODULE, wintypes.DWORD)
+        self._mouseHookId = windll.user32.SetWindowsHookExA(win32con.WH_MOUSE_LL, mousePointer,
+                                                            windll.kernel32.GetModuleHandleW(None), 0)
+
+        if not self._mouseHookId:
+            print(f"Could not install the mouse hook (error {windll.kernel32.GetLastError()}).")
+        elif self.mouseHooked:
+            self.mouseHooked()
+
+        # The hooks are called from this loop, so it has to keep running until WM_QUIT comes in.
+        msg = wintypes.MSG()
+        while windll.user32.GetMessageW(byref(msg), None, 0, 0) > 0:
+            if msg.message == WM_HOOK_KEYBOARD:
+                self.hookKeyboard(bool(msg.wParam))
+                continue
 
+            windll.user32.TranslateMessage(byref(msg))
+            windll.user32.DispatchMessageW(byref(msg))
 
-def mouseHook():
-    listener()
+        self.hookKeyboard(False)
+        windll.user32.UnhookWindowsHookEx(self._mouseHookId)
+        self._mouseHookId = None
 
+    def hookKeyboard(self, install: bool):
+        """Installs or removes the keyboard hook, on this thread, as its events are delivered through its loop."""
 
-def removeMouseHook():
-    global HOOK_ID
-    windll.user32.UnhookWindowsHookEx(HOOK_ID)
-    HOOK_ID = None
+        if install and not self._keyboardHookId:
+            self._keyboardHookId = windll.user32.SetWindowsHookExA(win32con.WH_KEYBOARD_LL, self._keyboardPointer,
+                                                                   windll.kernel32.GetModuleHandleW(None), 0)
+            if not self._keyboardHookId:
+                print(f"Could not install the keyboard hook (error {windll.kernel32.GetLastError()}).")
+        elif not install and self._keyboardHookId:
+            windll.user32.UnhookWindowsHookEx(self._keyboardHookId)
+            self._keyboardHookId = None
+            self._swallowedKeys.clear()
+
+    def start(self):
+        super().start()
+
+        # Register to remove the hooks when the interpreter exits.
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self.is_alive():
+            windll.user32.PostThreadMessageW(self.native_id, WM_QUIT, 0, 0)
+            self.join()
+
+    def push(self, event):
+        self.events.append(event)
+
+        if not self._wakePending and self.wake:
+            self._wakePending = True
+            self.wake()
+
+    def setMouseEnabled(self, enabled: bool):
+        """Opens or closes the gate for mouse events. Called by the GUI when menus are opened and closed."""
+
+        self.mouseEnabled = enabled
+
+        if not enabled:
+            self.events.clear()
+            self.lastMove = None
+
+    def setTypingEnabled(self, enabled: bool, passedKeys=()):
+        """
+        Starts or stops taking typed keys away from the focused app, see TYPED_KEYS. passedKeys are virtual key codes
+        that keep going to the app and the other hooks, see typedKeyCodes.
+        """
+
+        for vk in TYPED_KEYS:
+            self.typedFlags[vk] = vk not in passedKeys
+
+        if enabled != self.typingEnabled and self.is_alive():
+            windll.user32.PostThreadMessageW(self.native_id, WM_HOOK_KEYBOARD, int(enabled), 0)
+        self.typingEnabled = enabled
+
+    def drain(self):
+        """
+        Passes all buffered mouse events to the mouseHandlers, then calls the moveHandlers if the mouse moved. Should be
+        called on the GUI thread.
+        """
+
+        self._wakePending = False
+
+        while self.events:
+            wParam, point, mouseData, flags, time = self.events.popleft()
+
+            if wParam == WM_KEYDOWN:
+                for handle in typeHandlers:
+                    handle(TYPED_KEYS[point])
+                continue
+
+            event = KeyEvents(MOUSE_CODES[wParam], point, mouseData or 0, flags == 32, time)
+
+            for handle in mouseHandlers:
+                handle(event)
+
+        moveCount = self.moveCount
+        if moveCount != self._drainedMoveCount:
+            self._drainedMoveCount = moveCount
+
+            for handle in moveHandlers:
+                handle()
+
+
+def print_event(e):
+    print(e)
+    wParam = e[0]
+    # pass
+
+
+# mouseHandlers.append(print_event)
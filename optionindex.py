@@ -0,0 +1,93 @@
+# Search index over the labels of a scripted menu's options, for type-to-filter.
+# Built once per script result (see indexFor), so filtering even thousands of options stays well within a frame:
+# prefix matches come from a binary search over the sorted labels, fuzzy (in order, not necessarily adjacent) matches
+# from one compiled regex over the labels that contain every typed character.
+from bisect import bisect_left
+from collections import OrderedDict
+import re
+from threading import Lock
+
+
+class OptionIndex:
+    def __init__(self, labels: list[str]):
+        self.labels = [label.lower() for label in labels]
+
+        # Every label and every word in it, sorted, so a prefix is one contiguous range.
+        self.prefixes = sorted((word, index) for index, label in enumerate(self.labels)
+                               for word in {label, *label.split()})
+        self.prefixKeys = [word for word, index in self.prefixes]
+
+        self.charSets = [frozenset(label) for label in self.labels]
+
+        self._lastQuery = None
+        self._lastMatches: list[int] = []
+
+    def prefixMatches(self, query: str) -> list[int]:
+        """The options of which the label, or a word in it, starts with query. Whole label matches first."""
+
+        start = bisect_left(self.prefixKeys, query)
+
+        labelMatches, wordMatches = [], []
+        for word, index in self.prefixes[start:]:
+            if not word.startswith(query):
+                break
+            (labelMatches if word == self.labels[index] else wordMatches).append(index)
+
+        return list(dict.fromkeys(sorted(labelMatches) + sorted(wordMatches)))
+
+    def fuzzyMatches(self, query: str, candidates) -> list[int]:
+        """The candidates of which the label contains the characters of query in order."""
+
+        pattern = re.compile(".*?".join(map(re.escape, query)))
+        queryChars = set(query)
+
+        return [index for index in candidates
+                if queryChars <= self.charSets[index] and pattern.search(self.labels[index])]
+
+    def search(self, query: str) -> list[int]:
+        """Indices of the matching options, prefix matches first and then fuzzy ones, each in their original order."""
+
+        query = query.lower().strip()
+        if not query:
+            return list(range(len(self.labels)))
+
+        # Typing one more character can only narrow the matches down, so only the last ones are searched again.
+        if self._lastQuery and query.startswith(self._lastQuery):
+            candidates = self._lastMatches
+        else:
+            candidates = range(len(self.labels))
+
+        prefixMatches = self.prefixMatches(query)
+        isPrefixMatch = set(prefixMatches)
+        matches = prefixMatches + [index for index in self.fuzzyMatches(query, candidates) if index not in isPrefixMatch]
+
+        self._lastQuery, self._lastMatches = query, sorted(matches)
+        return matches
+
+
+_indexes: OrderedDict[int, tuple[list, OptionIndex]] = OrderedDict()
+_indexesLock = Lock()  # Indexes are built by the script workers, and looked up on the GUI thread.
+
+
+def indexFor(options: list[dict], maxSize: int = 8) -> OptionIndex:
+    """
+    The index of a list of options, built on first use. The ScriptedMenuProvider hands out the same list for the same
+    script result, and builds its index on the worker, so it's built once per result and not while typing.
+    """
+
+    key = id(options)
+    with _indexesLock:
+        entry = _indexes.get(key)
+        if entry is not None and entry[0] is options:
+            _indexes.move_to_end(key)
+            return entry[1]
+
+    index = OptionIndex([option["label"] for option in options])
+
+    with _indexesLock:
+        _indexes[key] = (options, index)  # Holding on to options keeps its id from being reused.
+
+        while len(_indexes) > maxSize:
+            _indexes.popitem(last=False)
+
+    return index
@@ -1,3 +1,4 @@
+from functools import partial
 import json
 import subprocess
 import sys
@@ -5,6 +6,7 @@ import win32gui as w32gui
 
 import keyboard
 
+from scriptworkers import iterateMenuOptions, loadModule, scriptRunner
 from settings.menuScripts.menuScript import MenuOption
 
 
@@ -26,17 +28,36 @@ def sendHotkey(params: list):
 
 
 def runScript(params: dict):  # TODO: Test for all code types.
+    """
+    Runs the script with the given args. Python scripts run in a warm worker process of the scriptRunner (see
+    scriptworkers.py), which saves starting an interpreter and importing e.g. keyboard on every trigger. When all
+    workers are busy, the script gets its own interpreter like before.
+    """
+
     filePath: str = params["filePath"]
+    args = list(params.get("args", []))  # Params are read-only, straight from the loaded profile.
+
+    if filePath.endswith('.py') and not scriptRunner.busy():
+        scriptRunner.submit(("script", filePath, args)).add_done_callback(partial(reportScriptResult, filePath))
+        return
 
     for scriptType in ('.py', '.ahk'):
         if filePath.endswith(scriptType):
-            args = None if "args" not in params else params["args"]
             subprocess.Popen([sys.executable, filePath] + args)
             return
 
     print(f"Invalid script type: {filePath}")
 
 
+def reportScriptResult(filePath: str, future):
+    if future.cancelled():
+        return
+
+    result = future.result()
+    if result[0] == "error":
+        print(f"Failed to run {filePath}:", result[1])
+
+
 def runProgram(params: dict):
     filePath: str = params["filePath"]
 
@@ -88,41 +109,35 @@ def createProfile():
 
 
 def runCommand(params: list):
-    params.insert(0, 'start')
+    params = ['start'] + list(params)  # Params are read-only, straight from the loaded profile.
     print(' '.join(params))
 
     subprocess.run(params, shell=True)
 
 
-def scriptedMenu(params: dict) -> list[MenuOption]:  # TODO: Rename to buildScriptedMenu.
+def streamScriptedMenu(params: dict):
     """
-    Upon opening piemenu, runs the script and populates the menu with the given results.
+    Runs the menu script in this process as a fresh module, and yields the MenuOptions it defines as the script
+    produces them (see menuScript.py). Menus run their scripts in the worker processes of the ScriptedMenuProvider
+    instead (see scriptedmenus.py).
     """
 
     filePath: str = params["filePath"]
 
     if not filePath.endswith('.py'):
         print(f"Invalid script type: {filePath}")
-        return []
-
-    parentFolder = '\\'.join(filePath.split('\\')[0:-1])
-    sys.path.append(parentFolder)
-
-    moduleName = filePath.replace('.py', '\\').split('\\')[-2]
+        return
 
     try:
-        command = "import importlib"
-        command += f"\nimport {moduleName}"
-        command += f"\nimportlib.reload({moduleName})"
-        command += f"\nmenuOptions = {moduleName}.menuOptions"
+        yield from iterateMenuOptions(loadModule(filePath))
+    except Exception as e:
+        print(f'Failed to run {filePath}:', e)
 
-        exec(command, globals())
 
-        return menuOptions
-    except Exception as e:
-        print(f'Failed to run {moduleName}:', e)
+def scriptedMenu(params: dict) -> list[MenuOption]:  # TODO: Rename to buildScriptedMenu.
+    """Runs the menu script to the end, and returns all its MenuOptions."""
 
-    return []
+    return list(streamScriptedMenu(params))
 
 
 FUNCTIONS = {"sendKeys": sendKeys,
@@ -0,0 +1,119 @@
+# One timer for all periodic work in the app.
+# Every task has its own interval, but they all share a single QTimer that is only armed for the next task that's due.
+# Inactive tasks cost nothing, and when no task is active the timer is stopped, so an idle app doesn't wake up at all.
+from time import perf_counter
+
+from PySide2 import QtCore
+
+
+class ScheduledTask:
+    """A periodic task. Mirrors the parts of the QTimer interface the app used: connect(), start(), stop()."""
+
+    def __init__(self, scheduler, name: str, interval: int, condition=None):
+        self.scheduler = scheduler
+        self.name = name
+        self.interval = interval  # ms
+        self.condition = condition  # Checked before every tick, the task stops itself once this returns False.
+
+        self.callbacks = []
+        self.active = False
+        self.nextDue = 0.0
+        self.ticks = 0
+
+    def connect(self, callback):
+        self.callbacks.append(callback)
+
+    def disconnect(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def start(self, interval: int = None):
+        if interval is not None:
+            self.interval = interval
+
+        self.scheduler.activate(self)
+
+    def stop(self):
+        self.scheduler.deactivate(self)
+
+    def isActive(self) -> bool:
+        return self.active
+
+    def run(self):
+        self.ticks += 1
+
+        for callback in list(self.callbacks):
+            callback()
+
+
+class Scheduler:
+    def __init__(self):
+        self.tasks: dict[str, ScheduledTask] = {}
+        self.activeTasks: list[ScheduledTask] = []
+
+        self.wakeups = 0
+        self._timer = None  # Created on first use, as timers need a running QApplication.
+
+    def task(self, name: str, interval: int, condition=None) -> ScheduledTask:
+        """Returns the task with the given name, creating it if it doesn't exist yet."""
+
+        if name not in self.tasks:
+            self.tasks[name] = ScheduledTask(self, name, interval, condition)
+
+        return self.tasks[name]
+
+    def activate(self, task: ScheduledTask):
+        task.nextDue = perf_counter() + task.interval / 1000
+
+        if not task.active:
+            task.active = True
+            self.activeTasks.append(task)
+
+        self.reschedule()
+
+    def deactivate(self, task: ScheduledTask):
+        if not task.active:
+            return
+
+        task.active = False
+        self.activeTasks.remove(task)
+
+        self.reschedule()
+
+    def reschedule(self):
+        if self._timer is None:
+            self._timer = QtCore.QTimer()
+            self._timer.setSingleShot(True)
+            self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+            self._timer.timeout.connect(self.tick)
+
+        if not self.activeTasks:
+            self._timer.stop()
+            return
+
+        nextDue = min(task.nextDue for task in self.activeTasks)
+        self._timer.start(max(0, round((nextDue - perf_counter()) * 1000)))
+
+    def tick(self):
+        self.wakeups += 1
+        now = perf_counter()
+
+        for task in list(self.activeTasks):
+            if not task.active or task.nextDue > now + 0.001:  # Tasks can stop each other during a tick.
+                continue
+
+            if task.condition and not task.condition():
+                task.active = False
+                self.activeTasks.remove(task)
+                continue
+
+            task.nextDue = now + task.interval / 1000
+            task.run()
+
+        self.reschedule()
+
+    def tickCounts(self) -> dict[str, int]:
+        return {name: task.ticks for name, task in self.tasks.items()}
+
+
+scheduler = Scheduler()
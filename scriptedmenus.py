@@ -0,0 +1,162 @@
+# Scripted menus (the 'scriptedMenu' slice function) without blocking the pie.
+# Menu scripts can be slow, so they're run by a pool of worker processes (see scriptworkers.py) instead of while the
+# menu is being built. Their results are cached per script path and params, and served stale-while-revalidate: a menu
+# opens with the last results (or a placeholder) right away, and is updated in place once the script has run again.
+# Scripts that yield their options (see settings/menuScripts/menuScript.py) are shown as they go, in batches.
+from collections import defaultdict, deque
+import os
+from statistics import median
+from time import perf_counter
+
+from optionindex import indexFor
+from scriptworkers import ScriptWorkerPool
+
+from PySide2 import QtCore
+
+
+SCRIPT_TIMEOUT = 10_000  # ms before a running script is given up on.
+MAX_AGE = 30  # Seconds results are served without running the script again, as long as the script didn't change.
+
+
+class ScriptedMenuRequest:
+    """A pending run of a menu script. Cancelled when the menu that asked for it is closed."""
+
+    def __init__(self, key: tuple, callback):
+        self.key = key
+        # callback(options, final): options being the slice dicts so far, or None if the run failed. final is False
+        # for the partial results of a script that's still running.
+        self.callback = callback
+
+        self.future = None
+        self.cancelled = False
+        self.finished = False
+
+    def cancel(self):
+        self.cancelled = True
+
+        if self.future:
+            # Only stops it if it hasn't started yet. A running script is left to finish (or time out), so its worker
+            # keeps the script imported.
+            self.future.cancel()
+
+
+class ScriptedMenuProvider(QtCore.QObject):
+    _results = QtCore.Signal(object, object)
+
+    def __init__(self, maxWorkers: int = 2, timeout: int = SCRIPT_TIMEOUT, maxAge: float = MAX_AGE,
+                 debug: bool = False):
+        super().__init__()
+
+        self.timeout = timeout
+        self.maxAge = maxAge
+        self.debug = debug  # Prints how long each script took.
+
+        self.workers = ScriptWorkerPool("ScriptedMenu", maxWorkers, timeout / 1000)
+
+        # (filePath, params) -> (script mtime, slice dicts, perf_counter() of the run).
+        self.cache: dict[tuple, tuple[float, list[dict], float]] = {}
+
+        self.runTimings: defaultdict[str, deque[float]] = defaultdict(lambda: deque(maxlen=50))  # filePath -> seconds
+
+        # Results come in on the worker threads, callbacks are run on the GUI thread.
+        self._results.connect(self._deliver, QtCore.Qt.QueuedConnection)
+
+    @staticmethod
+    def cacheKey(params) -> tuple:
+        return params["filePath"], repr(sorted((key, value) for key, value in params.items() if key != "filePath"))
+
+    @staticmethod
+    def scriptMtime(filePath: str) -> float:
+        try:
+            return os.path.getmtime(filePath)
+        except OSError:
+            return 0.0
+
+    def request(self, params, callback) -> tuple[list[dict] | None, ScriptedMenuRequest | None]:
+        """
+        Returns the cached results of the script (None if it never ran), and the request that runs it again in the
+        background, calling callback(options, final) on the GUI thread as results come in. No request is made if the
+        cached results are recent and the script didn't change since.
+        """
+
+        key = self.cacheKey(params)
+        cached = self.cache.get(key)
+
+        if cached:
+            mtime, options, fetchedAt = cached
+            if mtime == self.scriptMtime(params["filePath"]) and perf_counter() - fetchedAt < self.maxAge:
+                return options, None
+
+        request = ScriptedMenuRequest(key, callback)
+        self._run(request, params["filePath"])
+        QtCore.QTimer.singleShot(self.timeout, lambda: self._expire(request))
+
+        return (cached[1] if cached else None), request
+
+    def _run(self, request: ScriptedMenuRequest, filePath: str):
+        """Submits the script to the worker pool. Its messages and result come in on the pool's dispatching threads."""
+
+        if not filePath.endswith(".py"):
+            print(f"Invalid script type: {filePath}")
+            self._results.emit(request, (0.0, None, True, None))
+            return
+
+        mtime = self.scriptMtime(filePath)
+        options = []
+
+        def onMessage(message):
+            options.extend(message[1])
+            if not request.cancelled:
+                self._results.emit(request, (mtime, list(options), False, None))
+
+        def onDone(future):
+            if future.cancelled():  # Cancelled before a worker picked it up.
+                return
+
+            result = ("error", future.exception(), None) if future.exception() else future.result()
+            if result[0] == "error":
+                print(f"Failed to build scripted menu {filePath}:", result[1])
+                self._results.emit(request, (mtime, None, True, result[2]))
+                return
+
+            indexFor(options)  # Built here rather than on the first key typed into the menu.
+            self._results.emit(request, (mtime, options, True, result[1]))
+
+        request.future = self.workers.submit(("menu", filePath), onMessage)
+        request.future.add_done_callback(onDone)
+
+    @QtCore.Slot(object, object)
+    def _deliver(self, request: ScriptedMenuRequest, result):
+        mtime, options, final, runTime = result
+
+        if runTime is not None:
+            self.runTimings[request.key[0]].append(runTime)
+
+            if self.debug:
+                print(f"Scripted menu {request.key[0]} ran in {runTime * 1000:.1f} ms "
+                      f"(median {self.scriptTimes()[request.key[0]]:.1f} ms)")
+
+        if final and options is not None:
+            self.cache[request.key] = (mtime, options, perf_counter())
+
+        if request.finished or request.cancelled:
+            return
+
+        request.finished = final
+        request.callback(options, final)
+
+    def _expire(self, request: ScriptedMenuRequest):
+        if request.finished or request.cancelled:
+            return
+
+        print(f"Scripted menu {request.key[0]} took longer than {self.timeout} ms, giving up.")
+        request.finished = True
+        request.callback(None, True)
+
+    def scriptTimes(self) -> dict[str, float]:
+        """Median time in ms each script took to run in its worker, not counting the wait for one."""
+
+        return {filePath: median(timings) * 1000 for filePath, timings in self.runTimings.items() if timings}
+
+
+scriptedMenuProvider = ScriptedMenuProvider()
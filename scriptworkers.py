@@ -0,0 +1,324 @@
+# Pre-started worker processes for user scripts.
+# Menu scripts used to be imported into the app itself on every open, paying their import time each time and sharing
+# the app's interpreter with whatever they do, and every runScript started a new interpreter. Instead, a few worker
+# processes are started up front. Each one keeps the scripts it ran imported (or compiled, for runScript), and only
+# loads a script again when its file changed. Jobs and results are plain data sent over a pipe, and a worker whose
+# script hangs or crashes is killed and replaced, without the app noticing.
+# Only this module and the scripts are imported in the workers, no Qt: spawning runs the main script again in each of
+# them, and head.py only imports the app when it's run as the main script.
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import importlib.util
+import inspect
+import multiprocessing
+import os
+from queue import Queue
+import sys
+from threading import Lock
+from time import perf_counter
+
+
+WORKER_TIMEOUT = 10  # Seconds a job may take before its worker is killed and replaced.
+RUN_TIMEOUT = 60  # Same, for scripts started by runScript, which usually send a few keys but may do more.
+BATCH_INTERVAL = 0.05  # Seconds between the partial results a worker sends. The first one is sent right away.
+POLL_INTERVAL = 0.1  # Seconds between checks of the deadline while waiting for a worker.
+
+
+def addScriptFolder(filePath: str):
+    """Scripts import their siblings (e.g. menuScript), so their folder has to be importable."""
+
+    parentFolder = os.path.dirname(filePath)
+    if parentFolder not in sys.path:
+        sys.path.append(parentFolder)
+
+
+def loadModule(filePath: str):
+    """Runs the script as a fresh module, and returns it."""
+
+    addScriptFolder(filePath)
+
+    moduleName = os.path.splitext(os.path.basename(filePath))[0]
+    spec = importlib.util.spec_from_file_location(moduleName, filePath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def iterateMenuOptions(module):
+    """Yields the MenuOptions of a menu script module, see menuScript.py for the forms they can take."""
+
+    menuOptions = module.menuOptions
+    if callable(menuOptions):
+        menuOptions = menuOptions()
+
+    if not inspect.isasyncgen(menuOptions):
+        yield from menuOptions
+        return
+
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(menuOptions.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(menuOptions.aclose())
+        loop.close()
+
+
+class ModuleCache:
+    """
+    The modules and compiled code of the scripts a worker ran, loaded again only when their file changed. Menu scripts
+    with a module level menuOptions list compute their options while the module runs, so those are run again every
+    time. The modules they import stay loaded either way.
+    """
+
+    def __init__(self):
+        self.modules: dict[str, tuple[float, object]] = {}  # filePath -> (mtime, module)
+        self.codes: dict[str, tuple[float, object]] = {}  # filePath -> (mtime, code object)
+
+    def get(self, filePath: str):
+        mtime = os.path.getmtime(filePath)
+
+        cached = self.modules.get(filePath)
+        if cached and cached[0] == mtime and callable(getattr(cached[1], "menuOptions", None)):
+            return cached[1]
+
+        module = loadModule(filePath)
+        self.modules[filePath] = (mtime, module)
+
+        return module
+
+    def code(self, filePath: str):
+        mtime = os.path.getmtime(filePath)
+
+        cached = self.codes.get(filePath)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with open(filePath, "rb") as file:
+            code = compile(file.read(), filePath, "exec")
+        self.codes[filePath] = (mtime, code)
+
+        return code
+
+
+def runMenuJob(conn, modules: ModuleCache, filePath: str):
+    """Sends the options of a menu script in batches: ("options", [slice dicts]) messages."""
+
+    batch = []
+    lastBatch = 0.0
+
+    for option in iterateMenuOptions(modules.get(filePath)):
+        batch.append(option.toDict())
+
+        if perf_counter() - lastBatch >= BATCH_INTERVAL:
+            lastBatch = perf_counter()
+            conn.send(("options", batch))
+            batch = []
+
+    if batch:
+        conn.send(("options", batch))
+
+
+def runScriptJob(conn, modules: ModuleCache, filePath: str, args: list[str]):
+    """Runs the script as __main__ with the given arguments, like 'python filePath *args' would."""
+
+    addScriptFolder(filePath)
+
+    argv = sys.argv
+    sys.argv = [filePath, *args]
+    try:
+        exec(modules.code(filePath), {"__name__": "__main__", "__file__": filePath, "__builtins__": __builtins__})
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise RuntimeError(f"Exited with {e.code}") from None
+    finally:
+        sys.argv = argv
+
+
+JOBS = {"menu": runMenuJob,
+        "script": runScriptJob}
+
+
+def workerMain(conn):
+    """
+    The loop of a worker process. Jobs are (kind, *args) tuples, see JOBS, and every job ends with a ("done", seconds)
+    or ("error", message, seconds) message. None stops the worker.
+    """
+
+    modules = ModuleCache()
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):  # The app is gone.
+            return
+
+        if job is None:
+            return
+
+        kind, *args = job
+        start = perf_counter()
+        try:
+            JOBS[kind](conn, modules, *args)
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}", perf_counter() - start))
+        else:
+            conn.send(("done", perf_counter() - start))
+
+
+class ScriptWorker:
+    """One worker process and the app's end of its pipe. Used by one dispatching thread at a time."""
+
+    def __init__(self, context, name: str):
+        self.context = context
+        self.name = name
+
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+
+    def start(self):
+        self.conn, childConn = self.context.Pipe()
+        self.process = self.context.Process(target=workerMain, args=(childConn,), name=self.name, daemon=True)
+        self.process.start()
+        childConn.close()  # Only the worker's copy stays open, so its death shows up as EOF here.
+
+    def kill(self):
+        if self.process is None:
+            return
+
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+        self.process = self.conn = None
+
+    def restart(self):
+        self.kill()
+        self.start()
+        self.restarts += 1
+
+    def stop(self):
+        if self.process is None:
+            return
+
+        try:
+            self.conn.send(None)
+            self.process.join(1)
+        except OSError:
+            pass
+
+        self.kill()
+
+    def run(self, job: tuple, timeout: float, onMessage) -> tuple:
+        """
+        Sends the job and passes the messages it produces to onMessage, until the final ("done", ...) or
+        ("error", ...) one, which is returned. A worker that passes the timeout or dies is replaced.
+        """
+
+        if self.process is None:
+            self.start()
+
+        deadline = perf_counter() + timeout
+        try:
+            self.conn.send(job)
+
+            while True:
+                remaining = deadline - perf_counter()
+                if remaining <= 0:
+                    self.restart()
+                    return "error", f"Timed out after {timeout} s, worker restarted", None
+
+                if not self.conn.poll(min(remaining, POLL_INTERVAL)):
+                    continue
+
+                message = self.conn.recv()
+                if message[0] in ("done", "error"):
+                    return message
+
+                onMessage(message)
+        except (EOFError, OSError) as e:
+            self.restart()
+            return "error", f"Worker died ({str(e) or type(e).__name__}), restarted", None
+
+
+class ScriptWorkerPool:
+    """
+    A fixed number of ScriptWorkers. Jobs are handed to whichever is idle by a thread per worker, so waiting for the
+    scripts never blocks the caller.
+    """
+
+    def __init__(self, name: str, size: int = 2, timeout: float = WORKER_TIMEOUT):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+
+        # Spawned rather than forked, which is all Windows has anyway.
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = [ScriptWorker(self.context, f"{name}-{number}") for number in range(size)]
+        self.idle: Queue[ScriptWorker] = Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+        self.dispatcher = ThreadPoolExecutor(max_workers=size, thread_name_prefix=name)
+        self.started = False
+
+        self.pending = 0  # Jobs submitted and not finished (or cancelled) yet.
+        self.pendingLock = Lock()
+
+    def start(self):
+        """Starts the worker processes, so the first job doesn't wait for one. Jobs start them otherwise."""
+
+        if self.started:
+            return
+
+        self.started = True
+        for worker in self.workers:
+            if worker.process is None:
+                worker.start()
+
+    def submit(self, job: tuple, onMessage=lambda message: None, timeout: float = None):
+        """Runs the job on the first idle worker. Returns a Future of its final message, see ScriptWorker.run."""
+
+        with self.pendingLock:
+            self.pending += 1
+
+        future = self.dispatcher.submit(self.run, job, onMessage, timeout)
+        future.add_done_callback(self._jobDone)
+
+        return future
+
+    def _jobDone(self, future):
+        with self.pendingLock:
+            self.pending -= 1
+
+    def run(self, job: tuple, onMessage=lambda message: None, timeout: float = None) -> tuple:
+        """Like submit, but waits for the job. Meant for the dispatching threads, where submit runs it too."""
+
+        worker = self.idle.get()
+        try:
+            return worker.run(job, timeout or self.timeout, onMessage)
+        finally:
+            self.idle.put(worker)
+
+    def busy(self) -> bool:
+        """Whether a newly submitted job would have to wait for a worker."""
+
+        return self.pending >= self.size
+
+    def shutdown(self):
+        self.dispatcher.shutdown(wait=False, cancel_futures=True)
+
+        for worker in self.workers:
+            worker.stop()
+
+    def stats(self) -> dict[str, int]:
+        return {"workers": self.size,
+                "alive": sum(worker.process is not None and worker.process.is_alive() for worker in self.workers),
+                "restarts": sum(worker.restarts for worker in self.workers)}
+
+
+scriptRunner = ScriptWorkerPool("ScriptRunner", timeout=RUN_TIMEOUT)
@@ -1,3 +1,17 @@
+# Menu scripts define the slices of a 'scriptedMenu' slice. A script either has a module level list:
+#
+#     menuOptions = [MenuOption("Store", "runCommand", ["steam://store"]), ...]
+#
+# or a generator (plain or async) called menuOptions, that yields MenuOptions as it finds them. These are shown while
+# the script is still running, so slow scripts should yield:
+#
+#     def menuOptions():
+#         for game in scanLibrary():
+#             yield MenuOption(game.name, "runCommand", [game.url])
+#
+# Scripts with a list are run again every time their menu's options are fetched. Scripts with a generator stay loaded
+# in their worker process until the file changes, and only the generator is called again, so module level code (e.g.
+# imports and setup) runs once.
 from attrs import define
 
 
@@ -6,6 +6,7 @@ from enum import Enum
 from functools import partial
 import json
 import sys
+from types import MappingProxyType
 
 from PySide2 import QtWidgets, QtCore, QtGui
 
@@ -65,6 +66,18 @@ STANDARDATTRIBUTES = {NodeType.PROFILE: {"theme": InputType.TEXTFIELD,
                                         "enabled": InputType.CHECKBOX}}
 
 
+def freeze(obj):
+    """Returns a read-only copy of a JSON structure: dicts become mappingproxies, lists become tuples."""
+
+    if isinstance(obj, dict):
+        return MappingProxyType({key: freeze(value) for key, value in obj.items()})
+
+    if isinstance(obj, list):
+        return tuple(freeze(value) for value in obj)
+
+    return obj
+
+
 class SettingsManager:
     """A wrapper for everything JSON related."""
 
@@ -72,6 +85,8 @@ class SettingsManager:
         self.appProfiles = None
         self.globalSettings = None
         self.registeredApps = []
+        self.effectiveProfiles: dict[str, MappingProxyType] = {}
+        self.generation = 0  # Bumped on every compile, so caches of compiled profiles know when to let go.
 
         self.reloadSettings()
 
@@ -81,6 +96,7 @@ class SettingsManager:
         self.registeredApps.clear()
 
         self.registerProfiles()
+        self.compileProfiles()
 
     @staticmethod
     def loadJSONFile(filePath: str) -> dict:
@@ -113,6 +129,39 @@ class SettingsManager:
 
             self.registeredApps.append(profiles["ahkHandle"])
 
+    def compileProfiles(self):
+        """
+        Builds the read-only 'effective' profile of each registered app, keyed by ahkHandle. Every profile gets the
+        general pie menus and hotkeys of the default profile merged in, unless it contains a hotkey overriding the
+        general entry. The default profile itself is loaded as is. Switching profiles is then a single lookup, and the
+        JSON in self.appProfiles is never touched.
+        """
+
+        profiles = {profile["ahkHandle"]: profile for profile in self.appProfiles}
+        defaultProfile = freeze(profiles["Default"])
+
+        # Frozen once, so every effective profile shares the exact same general items.
+        generalItems = {option: tuple(item for item in defaultProfile.get(option, ())
+                                      if item.get("general", True) and item.get("enabled", True))
+                        for option in ("piemenus", "hotkeys")}
+
+        self.effectiveProfiles = {"Default": defaultProfile}
+
+        for handle in self.registeredApps:
+            profile = freeze(profiles[handle])
+
+            reservedHotkeys = {item["hotkey"] for option in ("piemenus", "hotkeys")
+                               for item in profile.get(option, ()) if item.get("enabled", True)}
+
+            effectiveProfile = dict(profile)
+            for option in ("piemenus", "hotkeys"):
+                effectiveProfile[option] = profile.get(option, ()) + tuple(
+                    item for item in generalItems[option] if item["hotkey"] not in reservedHotkeys)
+
+            self.effectiveProfiles[handle] = MappingProxyType(effectiveProfile)
+
+        self.generation += 1
+
     @staticmethod
     def buildJSONFile(obj: SettingsNode | SettingsMenu) -> dict:
         """Serializes the data contained in all widgets into a new JSON file."""
@@ -0,0 +1,17 @@
+# The app's modules live in the repository root and aren't installed, so the tests import them from there. Tests of
+# modules that need PySide2 (or the Windows-only libraries) are skipped where those aren't available.
+import os
+import sys
+
+import pytest
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    QtWidgets = pytest.importorskip("PySide2.QtWidgets")
+
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
@@ -0,0 +1,88 @@
+# The style sheet subset the pie themes are written in, compiled into ButtonStyles.
+import pytest
+
+
+pytest.importorskip("PySide2")
+
+from buttonstyle import HOVER, NORMAL, PRESSED, ButtonStyle, parseColor, parseLength, parseStyleSheet
+
+
+def test_declarations_are_sorted_by_state():
+    declarations = parseStyleSheet("""
+        /* A comment { with braces } */
+        QPushButton { color: white; Border-Radius: 4px }
+        QPushButton[hover=true] { color: red; }
+        QPushButton:pressed, QPushButton[pressed=true] { color: blue; }
+        QLabel { color: green; }
+    """)
+
+    assert declarations == {NORMAL: [("color", "white"), ("border-radius", "4px")],
+                            HOVER: [("color", "red")],
+                            PRESSED: [("color", "blue")]}
+
+
+def test_selector_lists_apply_to_every_state():
+    declarations = parseStyleSheet("QPushButton, QPushButton[hover=true] { font-size: 12px; }")
+
+    assert declarations[NORMAL] == declarations[HOVER] == [("font-size", "12px")]
+    assert declarations[PRESSED] == []
+
+
+def test_values_may_contain_colons():
+    declarations = parseStyleSheet("QPushButton { background-image: url(C:/icons/a.png); }")
+
+    assert declarations[NORMAL] == [("background-image", "url(C:/icons/a.png)")]
+
+
+@pytest.mark.parametrize("value, length", [("12px", 12), (" 3 ", 3), ("-2px", -2), ("none", 0), ("", 0)])
+def test_parse_length(value, length):
+    assert parseLength(value) == length
+
+
+def test_parse_color(qapp):
+    assert parseColor("rgba(10, 20, 30, 40)").getRgb() == (10, 20, 30, 40)
+    assert parseColor("rgb(10,20,30)").getRgb() == (10, 20, 30, 255)
+    assert parseColor("#ff0000").getRgb() == (255, 0, 0, 255)
+    assert parseColor("white").getRgb() == (255, 255, 255, 255)
+
+
+@pytest.mark.parametrize("padding, expected", [("1px", [1, 1, 1, 1]),
+                                               ("1px 2px", [1, 2, 1, 2]),
+                                               ("1px 2px 3px", [1, 2, 3, 2]),
+                                               ("1px 2px 3px 4px", [1, 2, 3, 4])])
+def test_padding_shorthand(qapp, padding, expected):
+    assert ButtonStyle(f"QPushButton {{ padding: {padding}; }}").padding == expected
+
+
+def test_padding_sides_override_the_shorthand(qapp):
+    style = ButtonStyle("QPushButton { padding: 1px; padding-left: 5px; }")
+
+    assert style.padding == [1, 1, 1, 5]
+
+
+def test_states_cascade_like_the_style_sheet(qapp):
+    style = ButtonStyle("""
+        QPushButton { color: white; background-color: black; border: 2px solid red; }
+        QPushButton[hover=true] { background-color: gray; }
+        QPushButton[pressed=true] { color: yellow; }
+    """)
+
+    normal, hover = style.state(False, False), style.state(True, False)
+    pressed, hoverPressed = style.state(False, True), style.state(True, True)
+
+    assert normal.backgroundColor.name() == "#000000" and hover.backgroundColor.name() == "#808080"
+    assert hover.textColor.name() == "#ffffff"
+    assert pressed.textColor.name() == hoverPressed.textColor.name() == "#ffff00"
+    assert pressed.backgroundColor.name() == "#000000" and hoverPressed.backgroundColor.name() == "#808080"
+    assert all(state.borderWidth == 2 and state.borderColor.name() == "#ff0000"
+               for state in (normal, hover, pressed, hoverPressed))
+
+
+def test_background_none_clears_the_background(qapp):
+    style = ButtonStyle("""
+        QPushButton { background-color: black; }
+        QPushButton[hover=true] { background: none; }
+    """)
+
+    assert style.state(False, False).backgroundColor is not None
+    assert style.state(True, False).backgroundColor is None
@@ -0,0 +1,65 @@
+# Hotkeys are registered with the keyboard library once per hotkey string, however many users it has.
+import pytest
+
+
+pytest.importorskip("PySide2")
+pytest.importorskip("win32gui")
+pytest.importorskip("keyboard")
+
+
+@pytest.fixture
+def hooks(monkeypatch):
+    import core
+
+    registered = {}  # hotkey -> callback, as registered with the keyboard library
+
+    def addHotkey(hotkey, callback, suppress=False):
+        registered[hotkey] = callback
+        return hotkey
+
+    monkeypatch.setattr(core.keyboard, "add_hotkey", addHotkey)
+    monkeypatch.setattr(core.keyboard, "remove_hotkey", registered.pop)
+
+    return core.HotkeyHooks(), registered
+
+
+def test_shared_hotkey_runs_every_user_and_is_removed_with_the_last(hooks):
+    hooks, registered = hooks
+    calls = []
+
+    profileHotkey = hooks.add("ctrl+a", calls.append, ["profile"])
+    triggerKey = hooks.add("ctrl+a", calls.append, ["trigger"])
+    assert list(registered) == ["ctrl+a"]
+
+    registered["ctrl+a"]()
+    assert calls == ["profile", "trigger"]
+
+    hooks.remove(profileHotkey)
+    registered["ctrl+a"]()
+    assert calls == ["profile", "trigger", "trigger"]
+
+    hooks.remove(triggerKey)
+    assert not registered and not hooks.hooks
+
+
+def test_identical_users_are_counted(hooks):
+    hooks, registered = hooks
+
+    first, second = hooks.add("b", print), hooks.add("b", print)
+
+    hooks.remove(first)
+    assert "b" in registered
+
+    hooks.remove(second)
+    assert "b" not in registered
+
+
+def test_forgotten_hotkeys_are_not_removed_again(hooks):
+    hooks, registered = hooks
+
+    handle = hooks.add("c", print)
+    registered.clear()  # As keyboard.unhook_all does.
+    hooks.forget()
+
+    hooks.remove(handle)
+    assert not hooks.hooks
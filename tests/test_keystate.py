@@ -0,0 +1,114 @@
+# Held key tracking. The hotkeys are parsed up front, so the scan codes don't depend on the keyboard layout.
+from threading import Thread
+
+import pytest
+
+
+pytest.importorskip("PySide2")
+pytest.importorskip("keyboard")
+
+from keystate import KeyStateTracker
+
+
+CTRL, RIGHT_CTRL, A, B = 29, 3613, 30, 48
+
+
+@pytest.fixture
+def tracker(qapp):
+    tracker = KeyStateTracker()
+    tracker._parsedHotkeys.update({"ctrl+a": (frozenset({CTRL, RIGHT_CTRL}), frozenset({A})),
+                                   "b": (frozenset({B}),)})
+
+    return tracker
+
+
+def test_hotkey_is_held_while_all_its_keys_are(tracker):
+    assert not tracker.isHeld("ctrl+a")
+
+    tracker.feed(A, True)
+    assert not tracker.isHeld("ctrl+a")
+
+    tracker.feed(RIGHT_CTRL, True)  # Either ctrl will do.
+    assert tracker.isHeld("ctrl+a")
+
+    tracker.feed(A, False)
+    assert not tracker.isHeld("ctrl+a")
+
+
+def test_empty_hotkey_is_never_held(tracker):
+    assert not tracker.isHeld("")
+    assert not tracker.isHeld(None)
+
+
+def test_release_callback_runs_right_away_when_not_held(tracker):
+    calls = []
+    tracker.onRelease("b", lambda: calls.append("b"))
+
+    assert calls == ["b"]
+
+
+def test_release_callback_runs_on_the_gui_thread_once_released(tracker, qapp):
+    calls = []
+
+    tracker.feed(CTRL, True)
+    tracker.feed(A, True)
+    tracker.onRelease("ctrl+a", lambda: calls.append("ctrl+a"))
+
+    tracker.feed(B, False)  # Not part of the hotkey.
+    qapp.processEvents()
+    assert calls == []
+
+    tracker.feed(A, False)
+    assert calls == []  # Queued for the GUI thread.
+
+    qapp.processEvents()
+    assert calls == ["ctrl+a"]
+    assert not tracker._releaseWatchers
+
+
+def test_cancelled_release_callback_is_not_run(tracker, qapp):
+    calls = []
+
+    def callback():
+        calls.append("b")
+
+    tracker.feed(B, True)
+    tracker.onRelease("b", callback)
+    tracker.cancelRelease(callback)
+    tracker.feed(B, False)
+
+    qapp.processEvents()
+    assert calls == []
+
+
+def test_release_while_adding_a_watcher_is_not_lost(tracker, qapp):
+    calls, feeders = [], []
+    keysHeld = tracker._keysHeld
+
+    def releaseWhileChecking(keys):
+        held = keysHeld(keys)
+
+        if not feeders:  # The key goes up on the input thread between onRelease's check and its watcher being added.
+            feeders.append(Thread(target=tracker.feed, args=(B, False)))
+            feeders[0].start()
+            feeders[0].join(0.2)
+
+        return held
+
+    tracker.feed(B, True)
+    tracker._keysHeld = releaseWhileChecking
+    tracker.onRelease("b", lambda: calls.append("b"))
+
+    feeders[0].join()
+    qapp.processEvents()
+    assert calls == ["b"]
+
+
+def test_fed_by_the_keyboard_library_without_blocking_keys(tracker):
+    import keyboard
+
+    assert tracker._onKeyEvent(keyboard.KeyboardEvent(keyboard.KEY_DOWN, B)) is True
+    assert tracker.isHeld("b")
+
+    assert tracker._onKeyEvent(keyboard.KeyboardEvent(keyboard.KEY_UP, B)) is True
+    assert not tracker.isHeld("b")
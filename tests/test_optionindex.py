@@ -0,0 +1,83 @@
+# Type-to-filter search over scripted menu options.
+from optionindex import OptionIndex, indexFor
+
+
+LABELS = ["Steam Store", "Library", "Half-Life 2", "Portal", "Portal 2", "Stardew Valley"]
+
+
+def test_empty_query_matches_everything():
+    index = OptionIndex(LABELS)
+
+    assert index.search("") == list(range(len(LABELS)))
+    assert index.search("   ") == list(range(len(LABELS)))
+
+
+def test_whole_label_prefixes_come_before_word_prefixes():
+    index = OptionIndex(["Big Portal", "Portal", "Portal 2"])
+
+    assert index.search("por") == [1, 2, 0]
+
+
+def test_prefix_matches_are_case_insensitive():
+    index = OptionIndex(LABELS)
+
+    assert index.search("STEAM") == [0]
+    assert index.search("valley") == [5]
+
+
+def test_fuzzy_matches_follow_prefix_matches():
+    index = OptionIndex(["Asterisk", "Star", "Last Stand"])
+
+    assert index.search("st") == [1, 2, 0]
+
+
+def test_fuzzy_matches_skip_characters():
+    index = OptionIndex(LABELS)
+
+    assert index.search("hl2") == [2]
+    assert index.search("sdv") == [5]
+
+
+def test_fuzzy_characters_must_be_in_order():
+    index = OptionIndex(["abc"])
+
+    assert index.search("ac") == [0]
+    assert index.search("ca") == []
+
+
+def test_narrowing_query_gives_the_same_results_as_a_fresh_search():
+    index = OptionIndex(LABELS)
+
+    for query in ("p", "po", "por", "port", "porta", "portal", "portal ", "portal 2"):
+        assert index.search(query) == OptionIndex(LABELS).search(query)
+
+
+def test_widening_query_searches_all_labels_again():
+    index = OptionIndex(LABELS)
+
+    assert index.search("portal 2") == [4]
+    assert index.search("portal") == [3, 4]
+
+
+def test_special_characters_are_matched_literally():
+    index = OptionIndex(["a.b", "axb", "(x)"])
+
+    assert index.search("a.") == [0]
+    assert index.search("(") == [2]
+
+
+def test_index_is_built_once_per_options_list():
+    options = [{"label": label} for label in LABELS]
+
+    assert indexFor(options) is indexFor(options)
+    assert indexFor(list(options)) is not indexFor(options)
+
+
+def test_index_cache_is_bounded():
+    first = [{"label": "First"}]
+    firstIndex = indexFor(first, maxSize=2)
+
+    for _ in range(2):
+        indexFor([{"label": "Other"}], maxSize=2)
+
+    assert indexFor(first, maxSize=2) is not firstIndex
@@ -0,0 +1,111 @@
+# The shared timer for periodic work. Ticks are run by hand, the tasks use intervals of 0 to be due right away.
+import pytest
+
+
+pytest.importorskip("PySide2")
+
+from scheduler import Scheduler
+
+
+def counter(calls: list, name: str):
+    return lambda: calls.append(name)
+
+
+def test_due_tasks_run_on_tick(qapp):
+    scheduler, calls = Scheduler(), []
+
+    task = scheduler.task("task", 0)
+    task.connect(counter(calls, "task"))
+    task.start()
+
+    scheduler.tick()
+    scheduler.tick()
+
+    assert calls == ["task", "task"]
+    assert scheduler.tickCounts() == {"task": 2}
+    assert scheduler.wakeups == 2
+
+
+def test_tasks_that_are_not_due_are_skipped(qapp):
+    scheduler, calls = Scheduler(), []
+
+    soon, later = scheduler.task("soon", 0), scheduler.task("later", 60000)
+    soon.connect(counter(calls, "soon"))
+    later.connect(counter(calls, "later"))
+    soon.start()
+    later.start()
+
+    scheduler.tick()
+
+    assert calls == ["soon"]
+
+
+def test_task_names_are_unique(qapp):
+    scheduler = Scheduler()
+
+    assert scheduler.task("task", 10) is scheduler.task("task", 20)
+    assert scheduler.tasks["task"].interval == 10
+
+
+def test_start_with_an_interval_changes_it(qapp):
+    task = Scheduler().task("task", 10)
+    task.start(30)
+
+    assert task.interval == 30 and task.isActive()
+
+
+def test_timer_only_runs_while_a_task_is_active(qapp):
+    scheduler = Scheduler()
+    task = scheduler.task("task", 50)
+
+    task.start()
+    assert scheduler._timer.isActive()
+
+    task.stop()
+    assert not task.isActive() and not scheduler._timer.isActive()
+
+
+def test_condition_stops_the_task(qapp):
+    scheduler, calls = Scheduler(), []
+    running = [True]
+
+    task = scheduler.task("task", 0, condition=lambda: running[0])
+    task.connect(counter(calls, "task"))
+    task.start()
+
+    scheduler.tick()
+    running[0] = False
+    scheduler.tick()
+
+    assert calls == ["task"]
+    assert not task.isActive() and not scheduler._timer.isActive()
+
+
+def test_tasks_can_stop_each_other_during_a_tick(qapp):
+    scheduler, calls = Scheduler(), []
+
+    first, second = scheduler.task("first", 0), scheduler.task("second", 0)
+    first.connect(second.stop)
+    first.connect(counter(calls, "first"))
+    second.connect(counter(calls, "second"))
+    first.start()
+    second.start()
+
+    scheduler.tick()
+
+    assert calls == ["first"]
+    assert first.isActive() and not second.isActive()
+
+
+def test_disconnected_callbacks_are_not_run(qapp):
+    scheduler, calls = Scheduler(), []
+    callback = counter(calls, "task")
+
+    task = scheduler.task("task", 0)
+    task.connect(callback)
+    task.disconnect(callback)
+    task.start()
+
+    scheduler.tick()
+
+    assert calls == [] and task.ticks == 1
@@ -0,0 +1,193 @@
+# The worker processes that run menu scripts and runScript scripts. These start real (spawned) processes.
+import os
+import shutil
+import textwrap
+import time
+
+import pytest
+
+from scriptworkers import ScriptWorkerPool
+
+
+MENU_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "settings", "menuScripts", "menuScript.py")
+
+
+@pytest.fixture
+def pool():
+    pool = ScriptWorkerPool("Test", size=1, timeout=10)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def writeScript(tmp_path):
+    """Writes a script next to a copy of menuScript.py, and returns its path."""
+
+    shutil.copy(MENU_SCRIPT, tmp_path)
+
+    def write(name: str, source: str) -> str:
+        path = tmp_path / name
+        path.write_text(textwrap.dedent(source))
+        return str(path)
+
+    return write
+
+
+def runMenu(pool, path: str) -> tuple[list[str], tuple]:
+    labels = []
+    result = pool.run(("menu", path), lambda message: labels.extend(option["label"] for option in message[1]))
+
+    return labels, result
+
+
+def test_generator_menu_sends_its_options_in_batches(pool, writeScript):
+    path = writeScript("generated.py", """
+        import time
+        from menuScript import MenuOption
+
+        def menuOptions():
+            for number in range(3):
+                yield MenuOption(f"Option {number}", "none", [])
+                time.sleep(0.1)  # Longer than BATCH_INTERVAL, so every option is its own batch.
+    """)
+
+    messages = []
+    result = pool.run(("menu", path), messages.append)
+
+    assert result[0] == "done"
+    assert [[option["label"] for option in batch] for kind, batch in messages] == [["Option 0"], ["Option 1"],
+                                                                                  ["Option 2"]]
+
+
+def test_async_generator_menu(pool, writeScript):
+    path = writeScript("asynchronous.py", """
+        from menuScript import MenuOption
+
+        async def menuOptions():
+            for number in range(2):
+                yield MenuOption(f"Option {number}", "none", [])
+    """)
+
+    labels, result = runMenu(pool, path)
+
+    assert result[0] == "done"
+    assert labels == ["Option 0", "Option 1"]
+
+
+def test_list_menu_runs_again_every_time(pool, writeScript):
+    path = writeScript("counted.py", """
+        import os
+        from menuScript import MenuOption
+
+        countFile = os.path.join(os.path.dirname(__file__), "count")
+        count = int(open(countFile).read()) + 1 if os.path.exists(countFile) else 1
+        open(countFile, "w").write(str(count))
+
+        menuOptions = [MenuOption(f"Run {count}", "none", [])]
+    """)
+
+    assert runMenu(pool, path)[0] == ["Run 1"]
+    assert runMenu(pool, path)[0] == ["Run 2"]
+
+
+def test_generator_menu_is_loaded_again_when_changed(pool, writeScript):
+    source = """
+        from menuScript import MenuOption
+
+        def menuOptions():
+            yield MenuOption("{label}", "none", [])
+    """
+    path = writeScript("changing.py", source.format(label="Before"))
+    assert runMenu(pool, path)[0] == ["Before"]
+
+    writeScript("changing.py", source.format(label="After"))
+    os.utime(path, (time.time() + 10, time.time() + 10))  # In case both writes got the same mtime.
+
+    assert runMenu(pool, path)[0] == ["After"]
+
+
+def test_hanging_script_times_out_and_its_worker_is_replaced(writeScript):
+    path = writeScript("hanging.py", """
+        import time
+
+        def menuOptions():
+            time.sleep(60)
+            yield
+    """)
+
+    pool = ScriptWorkerPool("Test", size=1, timeout=1)
+    try:
+        kind, message, seconds = pool.run(("menu", path))
+        assert kind == "error" and "Timed out" in message
+
+        assert pool.stats()["restarts"] == 1
+        assert pool.run(("menu", writeScript("empty.py", "menuOptions = []")))[0] == "done"
+    finally:
+        pool.shutdown()
+
+
+def test_crashing_script_restarts_its_worker(pool, writeScript):
+    path = writeScript("crashing.py", """
+        import os
+
+        os._exit(1)
+    """)
+
+    kind, message, seconds = pool.run(("menu", path))
+    assert kind == "error" and "Worker died" in message
+
+    assert pool.stats()["restarts"] == 1
+    assert pool.run(("menu", writeScript("empty.py", "menuOptions = []")))[0] == "done"
+
+
+def test_script_errors_are_reported(pool, writeScript, tmp_path):
+    kind, message, seconds = pool.run(("menu", str(tmp_path / "missing.py")))
+    assert kind == "error" and "FileNotFoundError" in message
+
+    kind, message, seconds = pool.run(("menu", writeScript("raising.py", "raise ValueError('bad script')")))
+    assert (kind, message) == ("error", "ValueError: bad script")
+
+    assert pool.stats()["restarts"] == 0
+
+
+def test_script_job_runs_as_main_with_arguments(pool, writeScript, tmp_path):
+    path = writeScript("runnable.py", """
+        import sys
+
+        if __name__ == "__main__":
+            open(sys.argv[1], "w").write(" ".join(sys.argv[2:]))
+    """)
+    output = tmp_path / "output"
+
+    assert pool.run(("script", path, [str(output), "a", "b"]))[0] == "done"
+    assert output.read_text() == "a b"
+
+
+def test_script_job_exit_codes(pool, writeScript):
+    assert pool.run(("script", writeScript("exits.py", "import sys; sys.exit(0)"), []))[0] == "done"
+
+    kind, message, seconds = pool.run(("script", writeScript("fails.py", "import sys; sys.exit(3)"), []))
+    assert (kind, message) == ("error", "RuntimeError: Exited with 3")
+
+
+def test_busy_once_every_worker_has_a_job(pool, writeScript):
+    path = writeScript("slow.py", """
+        import time
+
+        time.sleep(1)
+        menuOptions = []
+    """)
+    pool.start()
+
+    assert not pool.busy()
+
+    future = pool.submit(("menu", path))
+    assert pool.busy()
+
+    assert future.result(timeout=20)[0] == "done"
+
+    deadline = time.perf_counter() + 5  # The job is counted as finished just after its result is set.
+    while pool.busy() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert not pool.busy()
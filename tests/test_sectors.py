@@ -0,0 +1,67 @@
+# The sector table has to pick the same button as measuring every hover segment, submenus included.
+from math import cos, radians, sin
+import os
+
+import pytest
+
+
+pytest.importorskip("PySide2")
+pytest.importorskip("win32gui")
+pytest.importorskip("keyboard")
+
+
+def makePieMenu(sliceCount: int, subsliceCount: int, offsetAngle: int = 0):
+    from settingsMenu import freeze
+
+    slices = [{"label": f"Slice {i}", "function": "none", "params": [],
+               "subslices": [{"label": f"Sub {i}.{j}", "function": "none", "params": []}
+                             for j in range(subsliceCount if i % 2 == 0 else 0)]}
+              for i in range(sliceCount)]
+
+    return freeze({"label": "Test", "hotkey": "F13", "offset_angle": offsetAngle, "slices": slices})
+
+
+def cursorPositions(center):
+    """Rings around the summon position, out to beyond the submenus."""
+
+    from PySide2 import QtCore
+
+    for distance in range(0, 320, 12):
+        for angle in range(0, 360, 7):
+            yield QtCore.QPoint(center.x() + round(distance * cos(radians(angle))),
+                                center.y() + round(distance * sin(radians(angle))))
+
+
+@pytest.mark.parametrize("sliceCount, subsliceCount, offsetAngle", [(3, 2, 0), (8, 3, 0), (16, 4, 10), (33, 3, 45)])
+def test_sectors_match_exhaustive_search(qapp, sliceCount, subsliceCount, offsetAngle):
+    from PySide2 import QtCore
+    from frontend import Window
+    from settingsMenu import SettingsManager
+
+    settingsPath = os.path.join(os.path.dirname(os.path.dirname(__file__)), "settings", "globalSettings.json")
+    globalSettings = SettingsManager.loadJSONFile(settingsPath)["globalSettings"]
+    window = Window()
+    window.showMenu(makePieMenu(sliceCount, subsliceCount, offsetAngle), QtCore.QPoint(960, 540), globalSettings)
+    qapp.processEvents()
+
+    menu = window.menu
+    presenter = menu.menuPresenter
+    mismatches = []
+
+    for position in cursorPositions(menu.summonPos):
+        menu.currentMousePos = position
+
+        expected = presenter.findSelectedButtonExhaustive()
+        if presenter.findSelectedButton() is not expected:
+            mismatches.append((position.x(), position.y()))
+
+        # Follow the selection like the app does, opening submenus right away instead of after the dwell time.
+        presenter.updateSelectedButton(expected)
+        if presenter.hoverIntent.subMenu:
+            presenter.hoverIntent.fire()
+        qapp.processEvents()
+
+    window.killMenu()
+    window.close()
+
+    assert not mismatches
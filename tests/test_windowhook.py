@@ -0,0 +1,99 @@
+# Foreground window tracking, driven by the scripted fake backend instead of WinEvents.
+from time import perf_counter, sleep
+
+import pytest
+
+
+pytest.importorskip("PySide2")
+
+from windowhook import ForegroundBackend, ForegroundWatcher, ScriptedBackend
+
+
+def makeWatcher(backend):
+    watcher = ForegroundWatcher(backend, pollInterval=50)
+    events = {"foreground": [], "destroyed": []}
+
+    watcher.foregroundChanged.connect(events["foreground"].append)
+    watcher.windowDestroyed.connect(events["destroyed"].append)
+
+    return watcher, events
+
+
+def test_start_reports_the_current_foreground(qapp):
+    watcher, events = makeWatcher(ScriptedBackend(initialForeground=7))
+    watcher.start()
+
+    assert events["foreground"] == [7]
+    assert not watcher.usingFallback and not watcher.pollTimer.isActive()
+
+    watcher.stop()
+
+
+def test_pushed_changes_are_reported_once(qapp):
+    backend = ScriptedBackend(initialForeground=1)
+    watcher, events = makeWatcher(backend)
+    watcher.start()
+
+    for handle in (2, 2, 3, 1, 1):
+        backend.push(handle)
+
+    assert events["foreground"] == [1, 2, 3, 1]
+
+    watcher.stop()
+
+
+def test_destroyed_windows_are_reported(qapp):
+    backend = ScriptedBackend(initialForeground=1)
+    watcher, events = makeWatcher(backend)
+    watcher.start()
+
+    backend.destroy(5)
+    assert events["destroyed"] == [5]
+
+    watcher.stop()
+    backend.destroy(6)
+    backend.push(6)
+
+    assert events["destroyed"] == [5] and events["foreground"] == [1]
+
+
+def test_script_is_played_back(qapp):
+    watcher, events = makeWatcher(ScriptedBackend([(10, 2), (10, 3)], initialForeground=1))
+    watcher.start()
+
+    deadline = perf_counter() + 2
+    while len(events["foreground"]) < 3 and perf_counter() < deadline:
+        qapp.processEvents()
+        sleep(0.01)
+
+    assert events["foreground"] == [1, 2, 3]
+
+    watcher.stop()
+
+
+class PolledBackend(ForegroundBackend):
+    """Can't install a hook, like WinEventBackend when SetWinEventHook fails."""
+
+    def __init__(self):
+        self.foreground = 1
+
+    def currentForeground(self) -> int:
+        return self.foreground
+
+
+def test_falls_back_to_polling_without_a_hook(qapp):
+    backend = PolledBackend()
+    watcher, events = makeWatcher(backend)
+    watcher.start()
+
+    assert watcher.usingFallback and watcher.pollTimer.isActive()
+    assert events["foreground"] == [1]
+
+    watcher.poll()
+    backend.foreground = 4
+    watcher.poll()
+
+    assert events["foreground"] == [1, 4]
+
+    watcher.stop()
+    assert not watcher.pollTimer.isActive()
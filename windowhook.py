@@ -0,0 +1,184 @@
+# Foreground window tracking.
+# On Windows a WinEvent hook (EVENT_SYSTEM_FOREGROUND) is installed with WINEVENT_OUTOFCONTEXT, so the system delivers
+# the change through the message queue of the installing thread - the Qt GUI thread. Nothing is polled while the user
+# isn't switching windows. Polling GetForegroundWindow is only used when the hook can't be installed.
+from scheduler import scheduler
+
+import sys
+
+from PySide2 import QtCore
+
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_OBJECT_DESTROY = 0x8001
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+
+
+class ForegroundBackend:
+    """The platform interface the ForegroundWatcher talks to."""
+
+    def install(self, callback, destroyedCallback=None) -> bool:
+        """
+        Starts reporting foreground changes to callback(handle), and optionally destroyed windows to
+        destroyedCallback(handle). Returns False if not supported.
+        """
+        return False
+
+    def uninstall(self):
+        pass
+
+    def currentForeground(self) -> int:
+        return 0
+
+
+class WinEventBackend(ForegroundBackend):
+    def __init__(self):
+        self._hooks = []
+        self._procs = []  # The ctypes callbacks have to stay referenced for as long as the hooks are installed.
+
+    def install(self, callback, destroyedCallback=None) -> bool:
+        def foregroundHandler(hWinEventHook, event, hwnd, idObject, idChild, dwEventThread, dwmsEventTime):
+            callback(hwnd or self.currentForeground())
+
+        def destroyHandler(hWinEventHook, event, hwnd, idObject, idChild, dwEventThread, dwmsEventTime):
+            if hwnd and idObject == OBJID_WINDOW and idChild == CHILDID_SELF:  # Skip carets, menus and the like.
+                destroyedCallback(hwnd)
+
+        if not self._setHook(EVENT_SYSTEM_FOREGROUND, foregroundHandler, WINEVENT_OUTOFCONTEXT):
+            self.uninstall()
+            return False
+
+        if destroyedCallback:
+            self._setHook(EVENT_OBJECT_DESTROY, destroyHandler, WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS)
+
+        return True
+
+    def _setHook(self, event: int, handler, flags: int) -> bool:
+        from ctypes import windll, wintypes, WINFUNCTYPE
+
+        WinEventProc = WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND, wintypes.LONG,
+                                   wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        proc = WinEventProc(handler)
+
+        windll.user32.SetWinEventHook.restype = wintypes.HANDLE
+        windll.user32.SetWinEventHook.argtypes = (wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WinEventProc,
+                                                  wintypes.DWORD, wintypes.DWORD, wintypes.DWORD)
+        hook = windll.user32.SetWinEventHook(event, event, None, proc, 0, 0, flags)
+
+        if not hook:
+            return False
+
+        self._hooks.append(hook)
+        self._procs.append(proc)
+        return True
+
+    def uninstall(self):
+        if not self._hooks:
+            return
+
+        from ctypes import windll
+
+        for hook in self._hooks:
+            windll.user32.UnhookWinEvent(hook)
+
+        self._hooks.clear()
+        self._procs.clear()
+
+    def currentForeground(self) -> int:
+        import win32gui as w32gui
+
+        return w32gui.GetForegroundWindow()
+
+
+class ScriptedBackend(ForegroundBackend):
+    """
+    Fake backend for platforms without WinEvents, and for testing on Linux. Plays back a script of
+    (delay in ms, window handle) steps once installed, and allows pushing changes by hand.
+    """
+
+    def __init__(self, script=(), initialForeground: int = 0):
+        self.script = list(script)
+        self._foreground = initialForeground
+        self._callback = None
+        self._destroyedCallback = None
+
+    def install(self, callback, destroyedCallback=None) -> bool:
+        self._callback = callback
+        self._destroyedCallback = destroyedCallback
+
+        delay = 0
+        for stepDelay, handle in self.script:
+            delay += stepDelay
+            QtCore.QTimer.singleShot(delay, lambda h=handle: self.push(h))
+
+        return True
+
+    def uninstall(self):
+        self._callback = None
+        self._destroyedCallback = None
+
+    def currentForeground(self) -> int:
+        return self._foreground
+
+    def push(self, handle: int):
+        self._foreground = handle
+
+        if self._callback:
+            self._callback(handle)
+
+    def destroy(self, handle: int):
+        if self._destroyedCallback:
+            self._destroyedCallback(handle)
+
+
+def defaultBackend() -> ForegroundBackend:
+    return WinEventBackend() if sys.platform == "win32" else ScriptedBackend()
+
+
+class ForegroundWatcher(QtCore.QObject):
+    """
+    Emits foregroundChanged(handle) whenever another window is brought to the foreground, and windowDestroyed(handle)
+    when a top-level window is destroyed (only while the hook is used, not when polling).
+    """
+
+    foregroundChanged = QtCore.Signal(object)
+    windowDestroyed = QtCore.Signal(object)
+
+    def __init__(self, backend: ForegroundBackend = None, pollInterval: int = 100, parent=None):
+        super().__init__(parent)
+
+        self.backend = backend if backend else defaultBackend()
+        self.pollInterval = pollInterval
+        self.usingFallback = False
+
+        self.lastHandle = None
+
+        self.pollTimer = scheduler.task("winChange", pollInterval)
+        self.pollTimer.connect(self.poll)
+
+    def start(self):
+        self.lastHandle = None
+        self.usingFallback = not self.backend.install(self.onForegroundEvent, self.windowDestroyed.emit)
+
+        if self.usingFallback:
+            print("Could not install the foreground hook, falling back to polling.")
+            self.pollTimer.start(self.pollInterval)
+
+        self.poll()  # The hook only reports changes, so pick up the window that's focussed right now.
+
+    def stop(self):
+        self.backend.uninstall()
+        self.pollTimer.stop()
+
+    def poll(self):
+        self.onForegroundEvent(self.backend.currentForeground())
+
+    def onForegroundEvent(self, handle: int):
+        if handle == self.lastHandle:
+            return
+
+        self.lastHandle = handle
+        self.foregroundChanged.emit(handle)